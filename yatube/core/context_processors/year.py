@@ -1,8 +1,23 @@
+import time
+
 from django.utils import timezone
 
+_year = None
+_expires = 0.0
+
+
+def _current_year():
+    global _year, _expires
+    if time.time() >= _expires:
+        now = timezone.localtime()
+        _year = now.year
+        # год пересчитывается раз в сутки, а не на каждый рендеринг
+        tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        _expires = tomorrow.timestamp() + 24 * 60 * 60
+    return _year
+
 
 def year(request):
     """Добавляет переменную с текущим годом."""
 
-    now = timezone.now()
-    return {"year": now.year}
+    return {"year": _current_year()}
@@ -0,0 +1,64 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в настройке DATABASE_REPLICAS. Пока текущий
+запрос что-то записал или недавно записывал (см. ReplicaMiddleware),
+чтение тоже идет в основную базу: автор сразу видит свои изменения,
+даже если реплики отстают.
+"""
+
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DATABASE_REPLICAS = getattr(settings, "DATABASE_REPLICAS", [])
+
+_local = threading.local()
+
+
+def start(primary=False):
+    """Начало запроса: primary - читать только из основной базы."""
+
+    _local.primary = primary
+    _local.wrote = False
+
+
+def finish():
+    """Конец запроса. Возвращает True, если запрос писал в базу."""
+
+    wrote = getattr(_local, "wrote", False)
+    _local.primary = _local.wrote = False
+    return wrote
+
+
+def reads_from_primary():
+    """Читает ли текущий запрос из основной базы."""
+
+    return getattr(_local, "primary", False) or getattr(
+        _local, "wrote", False
+    )
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            not DATABASE_REPLICAS
+            or reads_from_primary()
+            # внутри транзакции читается то, что в ней записано
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # на репликах те же данные, что в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплики получают схему вместе с данными при копировании
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,58 @@
+import json
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер очереди фоновых задач: выполняет задачи пачками, "
+        "пока его не остановят (SIGINT/SIGTERM). С --once выходит, "
+        "когда очередь опустеет, с --stats печатает ее состояние."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=tasks.TASK_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--idle",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах между опросами пустой очереди.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить готовые задачи и выйти.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Напечатать глубину, задержку и число упавших задач.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(
+                json.dumps(tasks.stats(), ensure_ascii=False, indent=2)
+            )
+            return
+        stop = None
+        if not options["once"]:
+            stopping = []
+
+            def request_stop(signum, frame):
+                # текущая пачка доделывается, новая не берется
+                stopping.append(signum)
+
+            signal.signal(signal.SIGINT, request_stop)
+            signal.signal(signal.SIGTERM, request_stop)
+
+            def stop():
+                return bool(stopping)
+
+        done = tasks.run(options["batch_size"], options["idle"], stop)
+        self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}."))
@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db_router import DATABASE_REPLICAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Копирует основную базу SQLite в файлы реплик из настройки "
+        "DATABASE_REPLICAS онлайн-резервированием, не останавливая "
+        "запись. Заменяет репликацию при локальной проверке."
+    )
+
+    def handle(self, *args, **options):
+        if not DATABASE_REPLICAS:
+            raise CommandError("Реплики не настроены: DATABASE_REPLICAS.")
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        for alias in DATABASE_REPLICAS:
+            connections[alias].close()
+            target = sqlite3.connect(settings.DATABASES[alias]["NAME"])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f"{alias}: скопирована")
@@ -0,0 +1,231 @@
+"""Метрики запросов: время обработки, запросы к базе, рендеринг
+шаблонов и обращения к кэшу по каждому представлению.
+
+Замеры текущего запроса хранятся в локальной переменной потока,
+сводные гистограммы - в памяти процесса.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+METRICS_BUCKETS = getattr(
+    settings,
+    "METRICS_BUCKETS",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+_local = threading.local()
+_MISSING = object()
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing, длительности в мс."""
+
+        cache = f"hit {self.cache_hits}, miss {self.cache_misses}"
+        return ", ".join(
+            (
+                f"app;dur={self.duration * 1000:.1f}",
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} SQL"',
+                f"tpl;dur={self.template_time * 1000:.1f}",
+                f'cache;desc="{cache}"',
+            )
+        )
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса."""
+
+    return getattr(_local, "metrics", None)
+
+
+def _count_cache(cache):
+    """Оборачивает get и get_many экземпляра кэша любого бэкенда,
+    чтобы считать попадания и промахи. get_many считает по ключам,
+    а вызовы get изнутри него второй раз не учитываются."""
+
+    if getattr(cache, "_metrics_counted", False):
+        return
+    # методы класса берутся при каждом вызове: их может подменить
+    # бенчмарк (posts/benchmark.py)
+    backend = type(cache)
+
+    def counted_get(key, default=None, version=None):
+        if getattr(_local, "in_get_many", False):
+            return backend.get(cache, key, default, version)
+        value = backend.get(cache, key, _MISSING, version)
+        record_cache(hit=value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def counted_get_many(keys, version=None):
+        keys = list(keys)
+        _local.in_get_many = True
+        try:
+            found = backend.get_many(cache, keys, version=version)
+        finally:
+            _local.in_get_many = False
+        metrics = current()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    cache.get = counted_get
+    cache.get_many = counted_get_many
+    cache._metrics_counted = True
+
+
+def start():
+    # экземпляры кэшей свои у каждого потока: оборачиваются при первом
+    # запросе потока
+    for alias in settings.CACHES:
+        _count_cache(caches[alias])
+    _local.metrics = RequestMetrics()
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(
+            connection.execute_wrapper(_local.metrics.execute_wrapper)
+        )
+    _local.stack = stack
+    return _local.metrics
+
+
+def finish():
+    metrics = _local.metrics
+    metrics.duration = time.perf_counter() - metrics.started
+    _local.stack.close()
+    _local.metrics = _local.stack = None
+    return metrics
+
+
+def record_cache(hit):
+    metrics = current()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def record_template(duration):
+    metrics = current()
+    if metrics is not None:
+        metrics.template_time += duration
+
+
+class ViewStats:
+    """Сводка по представлению: гистограмма времени и суммы."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(METRICS_BUCKETS) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, metrics):
+        self.buckets[bisect_left(METRICS_BUCKETS, metrics.duration)] += 1
+        self.count += 1
+        self.duration += metrics.duration
+        self.queries += metrics.queries
+        self.db_time += metrics.db_time
+        self.template_time += metrics.template_time
+        self.cache_hits += metrics.cache_hits
+        self.cache_misses += metrics.cache_misses
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def add(self, view, metrics):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            stats.add(metrics)
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {**vars(stats), "buckets": list(stats.buckets)}
+                for view, stats in self._views.items()
+            }
+
+    def prometheus(self):
+        """Сводка в текстовом формате Prometheus."""
+
+        lines = ["# TYPE yatube_request_duration_seconds histogram"]
+        totals = []
+        for view, stats in sorted(self.snapshot().items()):
+            label = f'view="{view}"'
+            cumulative = 0
+            for bound, count in zip(METRICS_BUCKETS, stats["buckets"]):
+                cumulative += count
+                lines.append(
+                    "yatube_request_duration_seconds_bucket"
+                    f'{{{label},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                "yatube_request_duration_seconds_bucket"
+                f'{{{label},le="+Inf"}} {stats["count"]}'
+            )
+            lines.append(
+                f"yatube_request_duration_seconds_sum{{{label}}} "
+                f'{stats["duration"]:.6f}'
+            )
+            lines.append(
+                f"yatube_request_duration_seconds_count{{{label}}} "
+                f'{stats["count"]}'
+            )
+            totals.append((label, stats))
+        for name, key in (
+            ("yatube_db_queries_total", "queries"),
+            ("yatube_db_seconds_total", "db_time"),
+            ("yatube_template_seconds_total", "template_time"),
+            ("yatube_cache_hits_total", "cache_hits"),
+            ("yatube_cache_misses_total", "cache_misses"),
+        ):
+            lines.append(f"# TYPE {name} counter")
+            for label, stats in totals:
+                value = stats[key]
+                if isinstance(value, float):
+                    value = f"{value:.6f}"
+                lines.append(f"{name}{{{label}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
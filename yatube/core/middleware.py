@@ -0,0 +1,66 @@
+from django.conf import settings
+
+from . import db_router, metrics
+
+METRICS_ENABLED = getattr(settings, "METRICS_ENABLED", False)
+REPLICA_STICKY_COOKIE = getattr(
+    settings, "REPLICA_STICKY_COOKIE", "read_primary"
+)
+REPLICA_STICKY_SECONDS = getattr(settings, "REPLICA_STICKY_SECONDS", 15)
+
+
+class MetricsMiddleware:
+    """Замеряет время запроса, запросы к базе, рендеринг шаблонов
+    и обращения к кэшу, добавляет заголовок Server-Timing и копит
+    сводку по представлениям для страницы /metrics/.
+
+    Стоит первым в MIDDLEWARE, чтобы учесть работу остальных."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not METRICS_ENABLED:
+            return self.get_response(request)
+        metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current = metrics.finish()
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        metrics.registry.add(view, current)
+        response["Server-Timing"] = current.server_timing()
+        return response
+
+
+class ReplicaMiddleware:
+    """Липкость чтения к основной базе для PrimaryReplicaRouter.
+
+    Изменяющие запросы и запросы с cookie REPLICA_STICKY_COOKIE читают
+    из основной базы. Если запрос что-то записал, cookie ставится на
+    REPLICA_STICKY_SECONDS - время, за которое реплики догоняют."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not db_router.DATABASE_REPLICAS:
+            return self.get_response(request)
+        db_router.start(
+            primary=request.method not in ("GET", "HEAD", "OPTIONS")
+            or REPLICA_STICKY_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_router.finish()
+        if wrote:
+            response.set_cookie(
+                REPLICA_STICKY_COOKIE,
+                "1",
+                max_age=REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
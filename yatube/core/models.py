@@ -1,12 +1,65 @@
 from django.db import models
 
 
+class CreatedField(models.DateTimeField):
+    """Дата создания с auto_now_add, которая не перезаписывает
+    значение, заданное до вставки, например дату из файла импорта."""
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if add and value is not None:
+            return value
+        return super().pre_save(model_instance, add)
+
+    def deconstruct(self):
+        # для миграций это обычный DateTimeField: схема та же
+        name, _, args, kwargs = super().deconstruct()
+        return name, "django.db.models.DateTimeField", args, kwargs
+
+
 class CreatedModel(models.Model):
     """Абстрактная модель. Добавляет дату создания."""
 
-    created = models.DateTimeField(
-        "Дата создания", auto_now_add=True, db_index=True
+    created = CreatedField("Дата создания", auto_now_add=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
+class ModifiedModel(models.Model):
+    """Абстрактная модель. Добавляет дату последнего изменения,
+    по которой выбираются изменения с момента прошлой выгрузки."""
+
+    modified = models.DateTimeField(
+        "Дата изменения", auto_now=True, db_index=True
     )
 
     class Meta:
         abstract = True
+
+
+class Task(CreatedModel):
+    """Задача фоновой очереди (core/tasks.py). Пишется в той же
+    транзакции, что и изменение, которое ее породило, и удаляется
+    после успешного выполнения."""
+
+    name = models.CharField("Обработчик", max_length=100)
+    payload = models.TextField("Данные в JSON")
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    run_after = models.DateTimeField("Выполнить после", db_index=True)
+    locked_until = models.DateTimeField(
+        "Занята воркером до", null=True, blank=True
+    )
+    failed = models.BooleanField("Попытки исчерпаны", default=False)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+
+    class Meta:
+        ordering = ("pk",)
+        indexes = [
+            models.Index(fields=["failed", "run_after"], name="task_due_idx")
+        ]
+        verbose_name = "Задача"
+        verbose_name_plural = "Задачи"
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
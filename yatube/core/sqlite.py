@@ -0,0 +1,55 @@
+"""Профиль SQLite для продакшена.
+
+Прагмы SQLITE_PRAGMAS задаются каждому новому подключению через
+сигнал connection_created: журнал WAL, чтобы читатели не ждали
+писателя, synchronous=NORMAL, отображение файла в память, больший
+кэш страниц и ожидание блокировки вместо ошибки "database is locked".
+Постоянные подключения включаются через CONN_MAX_AGE в настройках.
+"""
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+SQLITE_PRAGMAS = getattr(settings, "SQLITE_PRAGMAS", {})
+SQLITE_PRODUCTION = getattr(settings, "SQLITE_PRODUCTION", False)
+SQLITE_CONN_MAX_AGE = getattr(settings, "SQLITE_CONN_MAX_AGE", 600)
+
+_enabled = SQLITE_PRODUCTION
+
+
+def apply_pragmas(connection, pragmas=SQLITE_PRAGMAS):
+    """Выполняет прагмы на подключении sqlite3."""
+
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+
+
+def configure(sender, connection, **kwargs):
+    if _enabled and connection.vendor == "sqlite":
+        apply_pragmas(connection.connection)
+
+
+@contextmanager
+def profile(production):
+    """Включает или выключает профиль для новых подключений,
+    чтобы сравнить оба на замерах."""
+
+    global _enabled
+    previous = _enabled
+    max_ages = {}
+    for alias in connections:
+        settings_dict = connections.databases[alias]
+        if settings_dict["ENGINE"].endswith("sqlite3"):
+            max_ages[alias] = settings_dict["CONN_MAX_AGE"]
+            settings_dict["CONN_MAX_AGE"] = (
+                SQLITE_CONN_MAX_AGE if production else 0
+            )
+    _enabled = production
+    try:
+        yield
+    finally:
+        _enabled = previous
+        for alias, max_age in max_ages.items():
+            connections.databases[alias]["CONN_MAX_AGE"] = max_age
@@ -0,0 +1,279 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    " key TEXT PRIMARY KEY,"
+    " value BLOB NOT NULL,"
+    " expires REAL,"
+    " stored REAL NOT NULL,"
+    " accessed REAL NOT NULL,"
+    " size INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)",
+)
+
+LOCK_PREFIX = ":lock:"
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов и потоков сервера.
+
+    Параметры OPTIONS:
+    MAX_ENTRIES и CULL_FREQUENCY - как у встроенных бэкендов Django,
+    при переполнении вытесняются давно не читавшиеся записи (LRU);
+    MAX_SIZE - предельный суммарный размер значений в байтах;
+    EARLY_REFRESH - доля времени жизни записи в ее конце, когда один
+    из читателей получает промах и пересчитывает значение, а остальные
+    продолжают получать старое (защита от лавины запросов);
+    LOCK_TIMEOUT - сколько секунд держится право на пересчет;
+    TOUCH_INTERVAL - не чаще скольких секунд обновлять время чтения.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location
+        self._max_size = int(options.get("MAX_SIZE", 64 * 1024 * 1024))
+        self._early_refresh = float(options.get("EARLY_REFRESH", 0.1))
+        self._lock_timeout = float(options.get("LOCK_TIMEOUT", 30))
+        self._touch_interval = float(options.get("TOUCH_INTERVAL", 60))
+        self._cull_every = int(options.get("CULL_EVERY", 20))
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение SQLite нельзя передавать между потоками
+        # и наследовать после fork, поэтому оно свое у каждого.
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+            local.writes = 0
+        return local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _acquire_refresh(self, connection, key, now):
+        """Право пересчитать значение получает только один читатель."""
+
+        lock_key = LOCK_PREFIX + key
+        locked = connection.execute(
+            "SELECT 1 FROM cache WHERE key = ? AND expires > ?",
+            (lock_key, now),
+        ).fetchone()
+        if locked:
+            return False
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM cache WHERE key = ? AND expires <= ?",
+                (lock_key, now),
+            )
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO cache VALUES (?, x'', ?, ?, ?, 0)",
+                (lock_key, now + self._lock_timeout, now, now),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            "SELECT value, expires, stored, accessed FROM cache "
+            "WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, stored, accessed = row
+        if expires is not None:
+            if expires <= now:
+                connection.execute(
+                    "DELETE FROM cache WHERE key = ? AND expires <= ?",
+                    (key, now),
+                )
+                return default
+            early = (expires - stored) * self._early_refresh
+            if now >= expires - early and self._acquire_refresh(
+                connection, key, now
+            ):
+                return default
+        if now - accessed >= self._touch_interval:
+            connection.execute(
+                "UPDATE cache SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return pickle.loads(value)
+
+    def _write(self, connection, key, value, timeout, now):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        connection.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+            (key, blob, self._expires(timeout), now, now, len(blob)),
+        )
+        connection.execute(
+            "DELETE FROM cache WHERE key = ?", (LOCK_PREFIX + key,)
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._write(connection, key, value, timeout, time.time())
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._maybe_cull(connection)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            exists = connection.execute(
+                "SELECT 1 FROM cache WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?)",
+                (key, now),
+            ).fetchone()
+            if not exists:
+                self._write(connection, key, value, timeout, now)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if not exists:
+            self._maybe_cull(connection)
+        return not exists
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE cache SET expires = ?, stored = ? WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (self._expires(timeout), now, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._connection().execute(
+            "DELETE FROM cache WHERE key IN (?, ?)", (key, LOCK_PREFIX + key)
+        )
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value FROM cache WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?)",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                "UPDATE cache SET value = ?, accessed = ?, size = ? "
+                "WHERE key = ?",
+                (blob, now, len(blob), key),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return value
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def _maybe_cull(self, connection):
+        local = self._local
+        local.writes += 1
+        if local.writes % self._cull_every == 0:
+            self.cull()
+
+    def cull(self):
+        """Удаляет истекшие записи, а при превышении MAX_ENTRIES или
+        MAX_SIZE - давно не читавшиеся записи."""
+
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM cache WHERE expires <= ?", (now,)
+            )
+            count, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+            if count > self._max_entries:
+                if self._cull_frequency == 0:
+                    limit = count
+                else:
+                    limit = count // self._cull_frequency or 1
+                connection.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (limit,),
+                )
+                size = connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM cache"
+                ).fetchone()[0]
+            if size > self._max_size:
+                excess = size - self._max_size
+                victims = []
+                rows = connection.execute(
+                    "SELECT key, size FROM cache ORDER BY accessed"
+                )
+                for victim, victim_size in rows:
+                    victims.append((victim,))
+                    excess -= victim_size
+                    if excess <= 0:
+                        break
+                connection.executemany(
+                    "DELETE FROM cache WHERE key = ?", victims
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
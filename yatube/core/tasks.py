@@ -0,0 +1,222 @@
+"""Очередь фоновых задач в основной базе.
+
+enqueue записывает задачу в той же транзакции, что и изменение,
+которое ее породило: откат отменяет и задачу, а коммит гарантирует,
+что она не потеряется при падении процесса. Воркер (команда
+run_tasks) забирает готовые задачи пачками одного обработчика,
+обработчик получает список данных всех задач пачки. Если пачка
+упала, ее задачи выполняются по одной, а упавшие повторяются с растущей
+паузой; после TASK_MAX_ATTEMPTS попыток задача помечается failed
+и остается в таблице для разбора.
+
+Без TASK_QUEUE_ASYNC обработчик (или его замена inline) вызывается
+сразу, как будто очереди нет.
+"""
+
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASK_QUEUE_ASYNC = getattr(settings, "TASK_QUEUE_ASYNC", False)
+TASK_BATCH_SIZE = getattr(settings, "TASK_BATCH_SIZE", 100)
+TASK_MAX_ATTEMPTS = getattr(settings, "TASK_MAX_ATTEMPTS", 5)
+TASK_RETRY_DELAY = getattr(settings, "TASK_RETRY_DELAY", 10)
+# сколько секунд пачка принадлежит воркеру; после этого ее заберет
+# другой, если первый упал, не закончив
+TASK_LEASE = getattr(settings, "TASK_LEASE", 300)
+
+HANDLERS = {}
+INLINE_HANDLERS = {}
+
+
+def handler(name, inline=None):
+    """Регистрирует обработчик задач name. Он получает список данных
+    задач пачки и должен быть идемпотентным: после сбоя задачи
+    выполняются еще раз. inline с тем же аргументом вызывается вместо
+    него без TASK_QUEUE_ASYNC."""
+
+    def register(function):
+        HANDLERS[name] = function
+        INLINE_HANDLERS[name] = inline or function
+        return function
+
+    return register
+
+
+def enqueue(name, payload, unique=False):
+    """Ставит задачу name с данными payload (любой JSON) в очередь
+    или без TASK_QUEUE_ASYNC сразу выполняет. С unique задача
+    не ставится, если такая же уже есть в очереди, в том числе
+    исчерпавшая попытки."""
+
+    enqueue_many(name, [payload], unique=unique)
+
+
+def enqueue_many(name, payloads, unique=False):
+    """То же, что enqueue, для многих задач сразу: одна вставка
+    и один запрос на проверку unique."""
+
+    if name not in HANDLERS:
+        raise KeyError(f"Неизвестная задача: {name}")
+    payloads = list(payloads)
+    if not payloads:
+        return
+    if not TASK_QUEUE_ASYNC:
+        INLINE_HANDLERS[name](payloads)
+        return
+    payloads = [json.dumps(payload) for payload in payloads]
+    if unique:
+        payloads = list(dict.fromkeys(payloads))
+        queued = set(
+            Task.objects.filter(name=name, payload__in=payloads).values_list(
+                "payload", flat=True
+            )
+        )
+        payloads = [payload for payload in payloads if payload not in queued]
+    now = timezone.now()
+    Task.objects.bulk_create(
+        Task(name=name, payload=payload, run_after=now) for payload in payloads
+    )
+
+
+def _claim(batch_size):
+    """Забирает пачку готовых задач одного обработчика, самого старого
+    в очереди. Возвращает (name, задачи) или (None, [])."""
+
+    now = timezone.now()
+    due = Task.objects.filter(failed=False, run_after__lte=now).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+    with transaction.atomic():
+        first = due.first()
+        if first is None:
+            return None, []
+        ids = list(
+            due.filter(name=first.name).values_list("pk", flat=True)[
+                :batch_size
+            ]
+        )
+        # условие due повторяется в UPDATE: задачу, которую успел
+        # забрать другой воркер, второй раз не взять
+        lease = now + timedelta(seconds=TASK_LEASE)
+        due.filter(pk__in=ids).update(locked_until=lease)
+        tasks = list(Task.objects.filter(pk__in=ids, locked_until=lease))
+    return first.name, tasks
+
+
+def _retry(tasks, error):
+    now = timezone.now()
+    for task in tasks:
+        task.attempts += 1
+        task.failed = task.attempts >= TASK_MAX_ATTEMPTS
+        delay = TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+        task.run_after = now + timedelta(seconds=delay)
+        task.locked_until = None
+        task.last_error = error
+    Task.objects.bulk_update(
+        tasks,
+        ["attempts", "failed", "run_after", "locked_until", "last_error"],
+    )
+
+
+def _execute(name, tasks, retry=True):
+    """Выполняет задачи одним вызовом обработчика и удаляет их.
+    При ошибке возвращает False и с retry назначает повтор."""
+
+    try:
+        with transaction.atomic():
+            HANDLERS[name]([json.loads(task.payload) for task in tasks])
+            Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+    except Exception:
+        logger.exception("Задачи %s не выполнены", name)
+        if retry:
+            _retry(tasks, traceback.format_exc())
+        return False
+    return True
+
+
+def run_batch(batch_size=TASK_BATCH_SIZE):
+    """Выполняет одну пачку задач. Возвращает число задач в ней,
+    0 - если готовых задач нет."""
+
+    name, tasks = _claim(batch_size)
+    if not tasks:
+        return 0
+    if len(tasks) == 1:
+        _execute(name, tasks)
+    elif not _execute(name, tasks, retry=False):
+        # одна плохая задача не должна держать всю пачку:
+        # задачи выполняются по одной, повторяются только упавшие
+        for task in tasks:
+            _execute(name, [task])
+    return len(tasks)
+
+
+def run(batch_size=TASK_BATCH_SIZE, idle=1.0, stop=None):
+    """Выполняет задачи, пока stop() не вернет True; без stop - пока
+    очередь не опустеет. Пустая очередь опрашивается раз в idle секунд.
+    Возвращает число обработанных задач."""
+
+    done = 0
+    while stop is None or not stop():
+        count = run_batch(batch_size)
+        done += count
+        if not count:
+            if stop is None:
+                break
+            time.sleep(idle)
+    return done
+
+
+def stats():
+    """Состояние очереди по обработчикам: ожидающие задачи (depth),
+    возраст самой старой из них в секундах (lag) и исчерпавшие
+    попытки (failed)."""
+
+    now = timezone.now()
+    result = {
+        name: {"depth": 0, "lag": 0.0, "failed": 0} for name in HANDLERS
+    }
+    rows = Task.objects.values("name", "failed").annotate(
+        count=Count("pk"), oldest=Min("created")
+    )
+    for row in rows.order_by():
+        queue = result.setdefault(
+            row["name"], {"depth": 0, "lag": 0.0, "failed": 0}
+        )
+        if row["failed"]:
+            queue["failed"] = row["count"]
+        else:
+            queue["depth"] = row["count"]
+            queue["lag"] = (now - row["oldest"]).total_seconds()
+    return result
+
+
+def prometheus():
+    """Состояние очереди в текстовом формате Prometheus."""
+
+    queues = sorted(stats().items())
+    lines = []
+    for metric, key in (
+        ("yatube_task_queue_depth", "depth"),
+        ("yatube_task_queue_lag_seconds", "lag"),
+        ("yatube_task_queue_failed", "failed"),
+    ):
+        lines.append(f"# TYPE {metric} gauge")
+        for name, queue in queues:
+            value = queue[key]
+            if isinstance(value, float):
+                value = f"{value:.3f}"
+            lines.append(f'{metric}{{task="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
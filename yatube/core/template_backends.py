@@ -0,0 +1,29 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metrics
+
+
+class TimedTemplate(Template):
+    """Шаблон, который учитывает время рендеринга в метриках запроса.
+    Вложенные include рендерятся внутри и отдельно не считаются."""
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.record_template(time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django с замером времени рендеринга."""
+
+    def from_string(self, template_code):
+        template = super().from_string(template_code)
+        return TimedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
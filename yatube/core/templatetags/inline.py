@@ -0,0 +1,48 @@
+from django import template
+from django.template import Engine
+
+register = template.Library()
+
+
+class InlineNode(template.Node):
+    def __init__(self, nodelist, extra):
+        self.nodelist = nodelist
+        self.extra = extra
+
+    def render(self, context):
+        if not self.extra:
+            return self.nodelist.render(context)
+        values = {
+            name: value.resolve(context) for name, value in self.extra.items()
+        }
+        with context.push(**values):
+            return self.nodelist.render(context)
+
+
+@register.tag
+def inline(parser, token):
+    """Тег inline, как include, но шаблон с постоянным именем
+    подставляется при компиляции: в цикле не нужно на каждой итерации
+    искать и рендерить отдельный шаблон, а разметка остается в одном
+    файле. Поддерживает "with имя=значение"."""
+
+    bits = token.split_contents()
+    if len(bits) < 2 or bits[1][0] not in "\"'" or bits[1][-1] != bits[1][0]:
+        raise template.TemplateSyntaxError(
+            f"{bits[0]} принимает имя шаблона в кавычках"
+        )
+    extra = {}
+    if len(bits) > 2:
+        if bits[2] != "with":
+            raise template.TemplateSyntaxError(
+                f"{bits[0]}: после имени шаблона ожидается with"
+            )
+        extra = template.base.token_kwargs(bits[3:], parser)
+        if not extra or len(extra) != len(bits) - 3:
+            raise template.TemplateSyntaxError(
+                f"{bits[0]}: ожидаются аргументы имя=значение после with"
+            )
+    loader = getattr(parser.origin, "loader", None)
+    engine = loader.engine if loader is not None else Engine.get_default()
+    included = engine.get_template(bits[1][1:-1])
+    return InlineNode(included.nodelist, extra)
@@ -1,6 +1,29 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Follow, Post
+
+from . import db_router, metrics, tasks
+from .metrics import registry
+from .models import Task
+from .middleware import REPLICA_STICKY_COOKIE, ReplicaMiddleware
+from .sqlite import SQLITE_PRAGMAS, configure, profile
+from .sqlite_cache import SQLiteCache
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -17,3 +40,318 @@ class ViewTestClass(TestCase):
         response = self.client.get(self.url_unexisting_page)
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, self.template_not_found)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f"{self.directory}/cache.sqlite3"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {"OPTIONS": options})
+
+    def test_cache_shared_between_instances(self):
+        """Записи видны другому экземпляру с тем же файлом,
+        как в соседнем процессе."""
+
+        self.make_cache().set("key", {"value": 1})
+        other = self.make_cache()
+        self.assertEqual(other.get("key"), {"value": 1})
+        self.assertFalse(other.add("key", "other"))
+        self.assertEqual(other.get("missing", "default"), "default")
+
+    def test_expired_and_incr(self):
+        """Истекшие записи не возвращаются, incr атомарно увеличивает."""
+
+        cache = self.make_cache()
+        cache.set("expired", "value", timeout=-1)
+        self.assertIsNone(cache.get("expired"))
+        cache.set("counter", 1, timeout=None)
+        self.assertEqual(cache.incr("counter", 5), 6)
+        with self.assertRaises(ValueError):
+            cache.incr("missing")
+
+    def test_lru_eviction_by_entries_and_size(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=2, TOUCH_INTERVAL=0
+        )
+        for i in range(4):
+            cache.set(f"key{i}", i)
+            time.sleep(0.01)
+        cache.get("key0")
+        cache.cull()
+        self.assertEqual(cache.get("key0"), 0)
+        self.assertFalse(cache.has_key("key1"))
+        self.assertFalse(cache.has_key("key2"))
+
+        cache = self.make_cache(MAX_SIZE=1500, TOUCH_INTERVAL=0)
+        cache.clear()
+        cache.set("old", "x" * 1000)
+        time.sleep(0.01)
+        cache.set("new", "y" * 1000)
+        cache.cull()
+        self.assertFalse(cache.has_key("old"))
+        self.assertTrue(cache.has_key("new"))
+
+    def test_early_refresh_single_recompute(self):
+        """В конце жизни записи промах получает только один читатель,
+        остальные получают старое значение до пересчета."""
+
+        cache = self.make_cache(EARLY_REFRESH=1)
+        cache.set("hot", "stale", timeout=60)
+        self.assertIsNone(cache.get("hot"))
+        self.assertEqual(self.make_cache(EARLY_REFRESH=1).get("hot"), "stale")
+        cache.set("hot", "fresh", timeout=60)
+        self.assertEqual(self.make_cache(EARLY_REFRESH=0).get("hot"), "fresh")
+
+
+class SQLiteCachePagesTests(TestCase):
+    """Страницы с SQLiteCache кэшем по умолчанию, как в разработке."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = self.settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "core.sqlite_cache.SQLiteCache",
+                    "LOCATION": f"{directory}/cache.sqlite3",
+                }
+            }
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create_user(username="author")
+        follower = User.objects.create_user(username="follower")
+        Follow.objects.create(user=follower, author=self.author)
+        Post.objects.create(author=self.author, text="Первая запись")
+        self.client.force_login(follower)
+
+    def test_follow_feed_cached(self):
+        """Повторный запрос ленты подписок берет записи из кэша, новая
+        запись автора видна сразу."""
+
+        self.assertIsInstance(caches["default"], SQLiteCache)
+        url = reverse("posts:follow_index")
+        with self.assertNumQueries(6):
+            self.assertContains(self.client.get(url), "Первая запись")
+        # сессия, пользователь, крупные авторы и COUNT(*) пагинатора;
+        # записи и счетчики - из кэша
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+        Post.objects.create(author=self.author, text="Вторая запись")
+        self.assertContains(self.client.get(url), "Вторая запись")
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Ответ содержит замеры запроса в заголовке Server-Timing."""
+
+        response = self.client.get("/")
+        timing = response["Server-Timing"]
+        for metric in ("app;dur=", "db;dur=", "tpl;dur=", "cache;desc="):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    def test_metrics_page_for_staff_only(self):
+        """Сводка по представлениям доступна только персоналу."""
+
+        self.client.get("/")
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
+
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+        )
+        self.assertContains(
+            response, 'yatube_cache_misses_total{view="posts:index"}'
+        )
+
+    def test_cache_hits_counted_for_any_backend(self):
+        """Попадания и промахи считаются и для LocMemCache, в том числе
+        в get_many, по одному на ключ."""
+
+        self.assertNotIsInstance(caches["default"], SQLiteCache)
+        self.client.get("/")
+        cold = registry.snapshot()["posts:index"]
+        self.assertGreater(cold["cache_misses"], 0)
+        self.client.get("/")
+        warm = registry.snapshot()["posts:index"]
+        self.assertGreater(warm["cache_hits"], cold["cache_hits"])
+
+        metrics.start()
+        cache.set("a", 1)
+        cache.get_many(["a", "b"])
+        cache.get("b")
+        current = metrics.finish()
+        self.assertEqual((current.cache_hits, current.cache_misses), (1, 2))
+
+
+class AnonymousSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_without_cookie_skips_session(self):
+        """Без cookie сессии страница не читает таблицу сессий:
+        SessionStore без ключа не идет в базу."""
+
+        self.client.get("/")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/")
+        self.assertContains(response, "Войти")
+        for query in context.captured_queries:
+            self.assertNotIn("django_session", query["sql"])
+
+
+@mock.patch.object(db_router, "DATABASE_REPLICAS", ["replica"])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def serve(self, request, write=False):
+        routes = []
+
+        def view(request):
+            routes.append(self.router.db_for_read(Post))
+            if write:
+                routes.append(self.router.db_for_write(Post))
+                routes.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        return ReplicaMiddleware(view)(request), routes
+
+    def test_reads_from_replica_writes_to_primary(self):
+        response, routes = self.serve(self.factory.get("/"))
+        self.assertEqual(routes, ["replica"])
+        self.assertNotIn(REPLICA_STICKY_COOKIE, response.cookies)
+
+        response, routes = self.serve(self.factory.post("/"), write=True)
+        self.assertEqual(routes, ["default", "default", "default"])
+        self.assertIn(REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После записи чтение идет в основную базу в том же запросе
+        и в следующих, пока есть cookie."""
+
+        response, routes = self.serve(self.factory.get("/"), write=True)
+        self.assertEqual(routes, ["replica", "default", "default"])
+
+        request = self.factory.get("/")
+        request.COOKIES[REPLICA_STICKY_COOKIE] = "1"
+        response, routes = self.serve(request)
+        self.assertEqual(routes, ["default"])
+        self.assertEqual(self.router.db_for_read(Post), "replica")
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    def test_pragmas_applied_to_new_connection(self):
+        """Профиль переводит базу в WAL и задает прагмы подключению."""
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        raw = sqlite3.connect(os.path.join(directory, "db.sqlite3"))
+        self.addCleanup(raw.close)
+        wrapper = mock.Mock(vendor="sqlite", connection=raw)
+
+        with profile(False):
+            configure(None, wrapper)
+        self.assertEqual(
+            raw.execute("PRAGMA journal_mode").fetchone()[0], "delete"
+        )
+        with profile(True):
+            configure(None, wrapper)
+        self.assertEqual(
+            raw.execute("PRAGMA journal_mode").fetchone()[0], "wal"
+        )
+        self.assertEqual(raw.execute("PRAGMA synchronous").fetchone()[0], 1)
+        self.assertEqual(
+            raw.execute("PRAGMA busy_timeout").fetchone()[0],
+            SQLITE_PRAGMAS["busy_timeout"],
+        )
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        patchers = [
+            mock.patch.object(tasks, "TASK_QUEUE_ASYNC", True),
+            mock.patch.dict(
+                tasks.HANDLERS, {"test.record": self.record}, clear=True
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def record(self, payloads):
+        if "fail" in payloads:
+            raise ValueError("fail")
+        self.calls.append(payloads)
+
+    def test_tasks_run_in_batches_off_the_request(self):
+        """Задачи ждут воркера и выполняются одной пачкой."""
+
+        for value in range(3):
+            tasks.enqueue("test.record", value)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(tasks.stats()["test.record"]["depth"], 3)
+
+        self.assertEqual(tasks.run(), 3)
+        self.assertEqual(self.calls, [[0, 1, 2]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_alone(self):
+        """Упавшая задача откладывается с попыткой, остальные
+        задачи ее пачки выполняются."""
+
+        tasks.enqueue("test.record", 1)
+        tasks.enqueue("test.record", "fail")
+
+        tasks.run_batch()
+        self.assertEqual(self.calls, [[1]])
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertIn("ValueError", task.last_error)
+        self.assertEqual(tasks.run_batch(), 0)
+
+        with mock.patch.object(tasks, "TASK_MAX_ATTEMPTS", 2):
+            Task.objects.update(run_after=task.created)
+            tasks.run_batch()
+        self.assertEqual(tasks.stats()["test.record"]["failed"], 1)
+        self.assertEqual(tasks.run_batch(), 0)
+
+
+class InlineTagTests(SimpleTestCase):
+    def test_inline_renders_template_in_loop_context(self):
+        """inline подставляет шаблон при компиляции и видит переменные
+        цикла и значения из with."""
+
+        template = Template(
+            "{% load inline %}{% for post in posts %}"
+            "{% inline 'posts/includes/post_list.html' with post_text=x %}"
+            "{% endfor %}"
+        )
+        self.assertEqual(
+            template.nodelist[1].nodelist_loop[0].__class__.__name__,
+            "InlineNode",
+        )
+        post = Post(pk=1, text="Текст поста", author=User(username="a"))
+        html = template.render(Context({"posts": [post], "x": "Другой"}))
+        self.assertIn("<p>Другой</p>", html)
+        html = template.render(Context({"posts": [post]}))
+        self.assertIn("<p>Текст поста</p>", html)
@@ -1,5 +1,9 @@
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import tasks
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     return render(request, "core/404.html", {"path": request.path}, status=404)
@@ -15,3 +19,15 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=""):
     return render(request, "core/403csrf.html")
+
+
+def metrics(request):
+    """Сводка метрик запросов и состояние очереди задач в формате
+    Prometheus, только для персонала."""
+
+    if not request.user.is_staff:
+        raise Http404
+    return HttpResponse(
+        registry.prometheus() + tasks.prometheus(),
+        content_type="text/plain; version=0.0.4",
+    )
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
+from . import search
 from .models import Group, Post
 
 
@@ -10,6 +12,15 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ("group",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE по всей таблице."""
+
+        query = search.build_query(search_term)
+        if not query or not search.available():
+            return super().get_search_results(request, queryset, search_term)
+        sql, params = search.match_sql(query)
+        return queryset.filter(pk__in=RawSQL(sql, params)), False
+
 
 admin.site.register(Post, PostAdmin)
 
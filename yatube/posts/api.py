@@ -0,0 +1,201 @@
+"""JSON API только для чтения: ленты постов, группы, профиля
+и комментарии поста.
+
+Строки выбираются через values() без создания объектов моделей,
+страница отдается потоком StreamingHttpResponse по мере чтения курсора
+базы. Пагинация курсорная по (created, id): параметр cursor берется
+из поля next предыдущего ответа, limit задает размер страницы.
+Параметр fields=id,text выбирает только нужные поля.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .models import Comment, Group, Post, User
+from .utils import CURSOR_NEXT, decode_cursor, encode_cursor
+
+API_PAGE_SIZE = getattr(settings, "API_PAGE_SIZE", 20)
+API_MAX_PAGE_SIZE = getattr(settings, "API_MAX_PAGE_SIZE", 1000)
+
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "created": "created",
+    "modified": "modified",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comments_count": "comments_count",
+}
+COMMENT_FIELDS = {
+    "id": "id",
+    "post": "post_id",
+    "author": "author__username",
+    "text": "text",
+    "created": "created",
+}
+# значения, которые отдаются не так, как хранятся в базе
+CONVERTERS = {
+    "image": lambda name: default_storage.url(name) if name else None,
+}
+
+
+class ApiError(Exception):
+    pass
+
+
+def _fields(request, available):
+    requested = request.GET.get("fields")
+    if not requested:
+        return list(available)
+    fields = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise ApiError(f"Неизвестные поля: {', '.join(sorted(unknown))}.")
+    return fields
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get("limit", API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("limit должен быть числом.")
+    return min(max(limit, 1), API_MAX_PAGE_SIZE)
+
+
+def _page(request, queryset, available):
+    """Строки страницы (без лишней строки-признака) и курсор следующей
+    страницы, который становится известен после последней строки."""
+
+    fields = _fields(request, available)
+    limit = _limit(request)
+    token = request.GET.get("cursor")
+    if token:
+        cursor = decode_cursor(token)
+        if cursor is None or cursor[0] != CURSOR_NEXT:
+            raise ApiError("Неверный курсор.")
+        _, created, pk = cursor
+        queryset = queryset.filter(
+            Q(created__lt=created) | Q(created=created, pk__lt=pk)
+        )
+    # ключ курсора выбирается всегда, даже если его нет в fields
+    lookups = {name: available[name] for name in fields}
+    lookups.setdefault("created", "created")
+    lookups.setdefault("id", "id")
+    rows = (
+        queryset.order_by("-created", "-pk")
+        .values_list(*lookups.values())[: limit + 1]
+        .iterator()
+    )
+    names = list(lookups)
+    state = {"next": None}
+
+    def records():
+        last = None
+        for count, row in enumerate(rows):
+            row = dict(zip(names, row))
+            if count == limit:
+                state["next"] = encode_cursor(
+                    CURSOR_NEXT, last["created"], last["id"]
+                )
+                break
+            last = row
+            yield {
+                name: CONVERTERS[name](row[name])
+                if name in CONVERTERS
+                else row[name]
+                for name in fields
+            }
+
+    return records(), state
+
+
+def _stream(request, queryset, available, **extra):
+    """Ответ {**extra, "results": [...], "next": url} потоком."""
+
+    try:
+        records, state = _page(request, queryset, available)
+    except ApiError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    def encode(value):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    def chunks():
+        yield "{"
+        for key, value in extra.items():
+            yield f"{encode(key)}: {encode(value)}, "
+        yield '"results": ['
+        for index, record in enumerate(records):
+            yield ("," if index else "") + encode(record)
+        next_url = None
+        if state["next"]:
+            params = request.GET.copy()
+            params["cursor"] = state["next"]
+            next_url = f"{request.path}?{params.urlencode()}"
+        yield f'], "next": {encode(next_url)}}}'
+
+    return StreamingHttpResponse(
+        chunks(), content_type="application/json; charset=utf-8"
+    )
+
+
+@require_GET
+def posts(request):
+    return _stream(request, Post.objects.all(), POST_FIELDS)
+
+
+@require_GET
+def group_posts(request, slug):
+    group = get_object_or_404(
+        Group.objects.values("id", "title", "slug", "description"),
+        slug=slug,
+    )
+    return _stream(
+        request,
+        Post.objects.filter(group_id=group["id"]),
+        POST_FIELDS,
+        group=group,
+    )
+
+
+@require_GET
+def profile_posts(request, username):
+    author = get_object_or_404(
+        User.objects.values(
+            "id",
+            "username",
+            "first_name",
+            "last_name",
+            "stat__posts_count",
+            "stat__followers_count",
+        ),
+        username=username,
+    )
+    full_name = f"{author['first_name']} {author['last_name']}".strip()
+    return _stream(
+        request,
+        Post.objects.filter(author_id=author["id"]),
+        POST_FIELDS,
+        author={
+            "username": author["username"],
+            "full_name": full_name,
+            "posts_count": author["stat__posts_count"] or 0,
+            "followers_count": author["stat__followers_count"] or 0,
+        },
+    )
+
+
+@require_GET
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.values("id"), pk=post_id)
+    return _stream(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS
+    )
@@ -0,0 +1,401 @@
+"""Нагрузочный прогон страниц yatube.
+
+generate_dataset наполняет базу синтетическими данными, run_scenarios
+гоняет сценарии через тестовый клиент Django с заданной параллельностью
+и считает задержки, пропускную способность и число запросов к базе,
+compare сравнивает результат с сохраненным эталоном, render_templates
+меряет рендеринг страниц без кэшированного загрузчика шаблонов и с ним,
+slow_io имитирует медленное хранилище задержкой каждого запроса к базе
+и чтения из кэша.
+"""
+
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection, connections
+from django.db.backends.signals import connection_created
+from django.template import Context, Engine
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+from PIL import Image
+
+from . import bulk
+from .models import Group, Post, User
+
+SCENARIOS = (
+    "index",
+    "group_posts",
+    "profile",
+    "post_detail",
+    "follow_index",
+    "post_create",
+    "add_comment",
+    "mixed",
+)
+# доля записей в сценарии mixed: чтение поста или новый комментарий
+MIXED_WRITE_SHARE = 0.2
+
+IMAGE_COUNT = 8
+
+RENDER_TEMPLATES = (
+    "posts/index.html",
+    "posts/group_list.html",
+)
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
+
+class Dataset:
+    """Что известно сценариям о данных: имена, группы, посты."""
+
+    def __init__(self, sample=1000):
+        self.usernames = list(
+            User.objects.values_list("username", flat=True)[:sample]
+        )
+        self.slugs = list(Group.objects.values_list("slug", flat=True))
+        self.post_ids = list(
+            Post.objects.order_by("?").values_list("pk", flat=True)[:sample]
+        )
+
+
+def _images(fake):
+    """Несколько картинок в хранилище, которые делят посты."""
+
+    names = []
+    for index in range(IMAGE_COUNT):
+        content = BytesIO()
+        Image.new("RGB", (1200, 800), fake.color()).save(content, "JPEG")
+        names.append(
+            default_storage.save(
+                f"posts/benchmark_{index}.jpg", ContentFile(content.getvalue())
+            )
+        )
+    return names
+
+
+def generate_dataset(
+    users=50,
+    groups=5,
+    posts=1000,
+    comments=2000,
+    follows=200,
+    images=0.1,
+    batch_size=1000,
+    seed=0,
+):
+    """Создает пользователей, группы, посты (доля images с картинкой),
+    комментарии и подписки. Возвращает Dataset."""
+
+    fake = Faker("ru_RU")
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+
+    usernames = [f"bench_{index}" for index in range(users)]
+    User.objects.bulk_create(
+        User(username=name, first_name=fake.first_name(), password="!")
+        for name in usernames
+    )
+    mixer.cycle(groups).blend(
+        Group,
+        title=(fake.sentence(nb_words=3) for _ in range(groups)),
+        slug=(f"bench-{index}" for index in range(groups)),
+    )
+    slugs = [f"bench-{index}" for index in range(groups)]
+    image_names = _images(fake) if images else []
+
+    bulk.import_records(
+        "post",
+        (
+            {
+                "author": rng.choice(usernames),
+                "group": rng.choice(slugs) if rng.random() < 0.7 else "",
+                "text": fake.paragraph(nb_sentences=5),
+                "image": (
+                    rng.choice(image_names)
+                    if image_names and rng.random() < images
+                    else ""
+                ),
+                "created": fake.date_time_this_decade().isoformat(),
+            }
+            for _ in range(posts)
+        ),
+        batch_size,
+    )
+    post_ids = list(Post.objects.values_list("pk", flat=True))
+    if post_ids:
+        bulk.import_records(
+            "comment",
+            (
+                {
+                    "post": rng.choice(post_ids),
+                    "author": rng.choice(usernames),
+                    "text": fake.sentence(),
+                }
+                for _ in range(comments)
+            ),
+            batch_size,
+        )
+    bulk.import_records(
+        "follow",
+        (
+            {"user": rng.choice(usernames), "author": rng.choice(usernames)}
+            for _ in range(follows)
+        ),
+        batch_size,
+    )
+    return Dataset()
+
+
+SLOW_CACHE_METHODS = ("get", "get_many")
+
+
+@contextmanager
+def slow_io(delay):
+    """Добавляет delay секунд к каждому запросу к базе во всех потоках,
+    включая подключения, открытые внутри блока, и к каждому чтению
+    из кэша."""
+
+    active = True
+
+    def wrapper(execute, sql, params, many, context):
+        if active:
+            time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def slow(method):
+        def wrapped(*args, **kwargs):
+            time.sleep(delay)
+            return method(*args, **kwargs)
+
+        return wrapped
+
+    # Экземпляры кэша свои у каждого потока, поэтому меняется класс.
+    # get_many из BaseCache сам вызывает get, его замедлять не нужно.
+    backend = type(caches["default"])
+    names = [
+        name
+        for name in SLOW_CACHE_METHODS
+        if getattr(backend, name) is not getattr(BaseCache, name)
+    ]
+    originals = {name: vars(backend).get(name) for name in names}
+    for name in names:
+        setattr(backend, name, slow(getattr(backend, name)))
+
+    def install(sender, connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False)
+    for existing in connections.all():
+        install(None, existing)
+    try:
+        yield
+    finally:
+        # из подключений других потоков обертку не убрать, она
+        # просто перестает ждать
+        active = False
+        for name, method in originals.items():
+            if method is None:
+                delattr(backend, name)
+            else:
+                setattr(backend, name, method)
+        connection_created.disconnect(install)
+        for existing in connections.all():
+            existing.execute_wrappers.remove(wrapper)
+
+
+def _request(name, client, dataset, rng):
+    if name == "index":
+        return client.get(reverse("posts:index"))
+    if name == "group_posts":
+        slug = rng.choice(dataset.slugs)
+        return client.get(reverse("posts:group_list", args=[slug]))
+    if name == "profile":
+        username = rng.choice(dataset.usernames)
+        return client.get(reverse("posts:profile", args=[username]))
+    if name == "post_detail":
+        post_id = rng.choice(dataset.post_ids)
+        return client.get(reverse("posts:post_detail", args=[post_id]))
+    if name == "follow_index":
+        return client.get(reverse("posts:follow_index"))
+    if name == "post_create":
+        return client.post(
+            reverse("posts:post_create"), {"text": "Нагрузочный пост"}
+        )
+    if name == "add_comment":
+        post_id = rng.choice(dataset.post_ids)
+        return client.post(
+            reverse("posts:add_comment", args=[post_id]),
+            {"text": "Нагрузочный комментарий"},
+        )
+    if name == "mixed":
+        write = rng.random() < MIXED_WRITE_SHARE
+        scenario = "add_comment" if write else "post_detail"
+        return _request(scenario, client, dataset, rng)
+    raise ValueError(f"Неизвестный сценарий: {name}")
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу, values отсортированы."""
+
+    if not values:
+        return 0.0
+    rank = max(math.ceil(share * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def _worker(name, dataset, count, seed, close_connection):
+    rng = random.Random(seed)
+    client = Client()
+    username = rng.choice(dataset.usernames)
+    client.force_login(User.objects.get(username=username))
+    latencies, queries, errors = [], 0, 0
+    try:
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                try:
+                    response = _request(name, client, dataset, rng)
+                except DatabaseError:
+                    # например, "database is locked" при конкурентной записи
+                    failed = True
+                else:
+                    failed = response.status_code >= 400
+                latencies.append(time.perf_counter() - started)
+            queries += len(context.captured_queries)
+            errors += failed
+    finally:
+        if close_connection:
+            connection.close()
+    return latencies, queries, errors
+
+
+def run_scenario(name, dataset, requests=100, concurrency=4, seed=0):
+    """Выполняет requests запросов сценария name в concurrency потоков,
+    у каждого свой клиент и свое соединение с базой."""
+
+    shares = [requests // concurrency] * concurrency
+    for index in range(requests % concurrency):
+        shares[index] += 1
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [_worker(name, dataset, requests, seed, False)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(
+                executor.map(
+                    _worker,
+                    [name] * concurrency,
+                    [dataset] * concurrency,
+                    shares,
+                    [seed + index for index in range(concurrency)],
+                    [True] * concurrency,
+                )
+            )
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(value for result in results for value in result[0])
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": sum(result[2] for result in results),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "queries_per_request": (
+            round(sum(result[1] for result in results) / total, 2)
+            if total
+            else 0.0
+        ),
+    }
+
+
+def run_scenarios(dataset, names=SCENARIOS, **options):
+    return {name: run_scenario(name, dataset, **options) for name in names}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Сравнивает результаты с эталоном. Возвращает список
+    ухудшений: p95 дольше больше чем на долю tolerance или больше
+    запросов к базе на запрос."""
+
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} мс"
+            )
+        if current["queries_per_request"] > previous["queries_per_request"]:
+            regressions.append(
+                f"{name}: запросов к базе {previous['queries_per_request']}"
+                f" -> {current['queries_per_request']}"
+            )
+    return regressions
+
+
+def _render_context():
+    # страница постов в памяти: рендеринг меряется без базы
+    author = User(username="benchmark", first_name="Нагрузка")
+    group = Group(pk=1, title="Группа", slug="benchmark")
+    posts = [
+        Post(pk=pk, author=author, group=group, text="Текст поста " * 20)
+        for pk in range(1, settings.POST_PER_PAGE + 1)
+    ]
+    return {
+        "page_obj": Paginator(posts, settings.POST_PER_PAGE).page(1),
+        "group": group,
+        "cache_timeout": 0,
+        "cache_version": 0,
+    }
+
+
+def render_templates(names=RENDER_TEMPLATES, rounds=200):
+    """Среднее время рендеринга страниц постов в мс с загрузчиками
+    шаблонов без кэша (plain_ms) и с кэшированным загрузчиком
+    (cached_ms). Кэш фрагментов на время замера отключен."""
+
+    engine = Engine.get_default()
+    options = {"dirs": engine.dirs, "libraries": engine.libraries}
+    variants = {
+        "plain_ms": Engine(loaders=TEMPLATE_LOADERS, **options),
+        "cached_ms": Engine(
+            loaders=[
+                ("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)
+            ],
+            **options,
+        ),
+    }
+    context = _render_context()
+    dummy = {
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    }
+    results = {}
+    with override_settings(CACHES=dummy):
+        for name in names:
+            results[name] = {}
+            for key, engine in variants.items():
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    engine.get_template(name).render(Context(context))
+                elapsed = time.perf_counter() - started
+                results[name][key] = round(elapsed / rounds * 1000, 3)
+    return results
@@ -0,0 +1,395 @@
+"""Потоковый импорт и экспорт групп, постов, комментариев и подписок.
+
+Записи читаются из JSONL или CSV по одной и вставляются пачками через
+bulk_create, каждая пачка в своей транзакции. Выгрузка бывает полной
+или только изменениями после водяного знака (export_changes).
+Сигналы при bulk_create не срабатывают, поэтому счетчики, ленты
+подписок, поисковый индекс и версии кэша обновляются здесь же, а
+миниатюры картинок ставятся в очередь, один раз на пачку.
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from datetime import timedelta
+from itertools import islice
+
+from core import tasks
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, feed, search
+from .models import Comment, Follow, Group, Post, Tombstone, User
+from .tasks import THUMBNAILS
+
+FORMATS = ("jsonl", "csv")
+# Изменения моложе CHANGES_LAG секунд не выгружаются: транзакции,
+# которые их пишут, могли еще не закоммититься.
+CHANGES_LAG = getattr(settings, "CHANGES_LAG", 5)
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return "jsonl" if extension in ("json", "jsonl", "ndjson") else extension
+
+
+def read_records(stream, data_format):
+    """Записи файла по одной, без чтения файла целиком."""
+
+    if data_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _datetime(value):
+    if not value:
+        return timezone.now()
+    if not isinstance(value, str):
+        return value
+    value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value or timezone.now()
+
+
+def _ids(model, rows):
+    """Первичные ключи для строк: из файла или следующие после
+    наибольшего. SQLite не возвращает id из bulk_create, а они нужны
+    для лент, индекса и счетчиков.
+
+    Вызывается в транзакции пачки. В SQLite пустой UPDATE
+    sqlite_sequence сразу берет блокировку записи до коммита, поэтому
+    параллельный импорт или обычное создание не займет те же id.
+    Новые id идут после всех явных id пачки и после удаленных записей
+    (sqlite_sequence), чтобы не совпасть ни с теми, ни с другими."""
+
+    used = [int(row["id"]) for row in rows if row.get("id")]
+    if connection.vendor == "sqlite":
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = seq WHERE name = %s",
+                [table],
+            )
+            cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = %s", [table]
+            )
+            used.extend(cursor.fetchone() or ())
+    used.append(model.objects.aggregate(top=Max("pk"))["top"] or 0)
+    next_id = max(used) + 1
+    ids = []
+    for row in rows:
+        if row.get("id"):
+            ids.append(int(row["id"]))
+        else:
+            ids.append(next_id)
+            next_id += 1
+    return ids
+
+
+def _user_ids(usernames):
+    return dict(
+        User.objects.filter(username__in=set(usernames)).values_list(
+            "username", "pk"
+        )
+    )
+
+
+def _import_groups(rows):
+    groups = [
+        Group(
+            pk=pk,
+            title=row["title"],
+            slug=row["slug"],
+            description=row.get("description") or "",
+        )
+        for pk, row in zip(_ids(Group, rows), rows)
+    ]
+    Group.objects.bulk_create(groups)
+    caching.bump(
+        caching.GROUPS, *(caching.group_scope(group.pk) for group in groups)
+    )
+    return len(groups)
+
+
+def _import_posts(rows):
+    authors = _user_ids(row["author"] for row in rows)
+    groups = dict(
+        Group.objects.filter(
+            slug__in={row["group"] for row in rows if row.get("group")}
+        ).values_list("slug", "pk")
+    )
+    posts = []
+    for pk, row in zip(_ids(Post, rows), rows):
+        group = row.get("group")
+        if row["author"] not in authors or (group and group not in groups):
+            continue
+        posts.append(
+            Post(
+                pk=pk,
+                author_id=authors[row["author"]],
+                group_id=groups.get(group),
+                text=row["text"],
+                image=row.get("image") or "",
+                created=_datetime(row.get("created")),
+            )
+        )
+    # дата из файла сохраняется: CreatedField не заменяет
+    # заданное значение
+    Post.objects.bulk_create(posts)
+
+    for author_id, total in Counter(p.author_id for p in posts).items():
+        counters.change_author_posts(author_id, total)
+    for group_id, total in Counter(p.group_id for p in posts).items():
+        counters.change_group_posts(group_id, total)
+    feed.fan_out_many(posts)
+    search.index_posts(posts)
+    tasks.enqueue_many(
+        THUMBNAILS,
+        sorted({post.image.name for post in posts if post.image}),
+        unique=True,
+    )
+    caching.bump(
+        caching.INDEX,
+        *{caching.author_scope(post.author_id) for post in posts},
+        *{
+            caching.group_scope(post.group_id)
+            for post in posts
+            if post.group_id is not None
+        },
+    )
+    return len(posts)
+
+
+def _import_comments(rows):
+    authors = _user_ids(row["author"] for row in rows)
+    posts = set(
+        Post.objects.filter(
+            pk__in={int(row["post"]) for row in rows}
+        ).values_list("pk", flat=True)
+    )
+    comments = [
+        Comment(
+            pk=pk,
+            post_id=int(row["post"]),
+            author_id=authors[row["author"]],
+            text=row["text"],
+            created=_datetime(row.get("created")),
+        )
+        for pk, row in zip(_ids(Comment, rows), rows)
+        if row["author"] in authors and int(row["post"]) in posts
+    ]
+    Comment.objects.bulk_create(comments)
+
+    totals = Counter(comment.post_id for comment in comments)
+    for post_id, total in totals.items():
+        counters.change_post_comments(post_id, total)
+    caching.bump(*(caching.post_scope(post_id) for post_id in totals))
+    return len(comments)
+
+
+def _import_follows(rows):
+    users = _user_ids(
+        name for row in rows for name in (row["user"], row["author"])
+    )
+    pairs = {
+        (users[row["user"]], users[row["author"]])
+        for row in rows
+        if row["user"] in users
+        and row["author"] in users
+        and row["user"] != row["author"]
+    }
+    pairs -= set(
+        Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list("user", "author")
+    )
+    Follow.objects.bulk_create(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    )
+
+    for author_id, total in Counter(a for _, a in pairs).items():
+        counters.change_author_followers(author_id, total)
+    for user_id, author_id in pairs:
+        feed.backfill(user_id, author_id)
+    caching.bump(*{caching.follow_scope(user_id) for user_id, _ in pairs})
+    return len(pairs)
+
+
+IMPORTERS = {
+    "group": _import_groups,
+    "post": _import_posts,
+    "comment": _import_comments,
+    "follow": _import_follows,
+}
+
+
+def import_records(model, records, batch_size, skip=0, on_batch=None):
+    """Загружает записи пачками по batch_size, пропустив первые skip.
+
+    После коммита каждой пачки вызывается on_batch(обработано записей,
+    вставлено строк), чтобы сохранить точку продолжения.
+    Возвращает (обработано записей, вставлено строк)."""
+
+    importer = IMPORTERS[model]
+    records = iter(records)
+    done, inserted = skip, 0
+    for _ in islice(records, skip):
+        pass
+    while True:
+        rows = list(islice(records, batch_size))
+        if not rows:
+            break
+        with transaction.atomic():
+            inserted += importer(rows)
+        done += len(rows)
+        if on_batch is not None:
+            on_batch(done, inserted)
+    return done, inserted
+
+
+EXPORTS = {
+    "group": (
+        Group.objects.all(),
+        {
+            "id": "id",
+            "title": "title",
+            "slug": "slug",
+            "description": "description",
+        },
+    ),
+    "post": (
+        Post.objects.all(),
+        {
+            "id": "id",
+            "author": "author__username",
+            "group": "group__slug",
+            "text": "text",
+            "image": "image",
+            "created": "created",
+        },
+    ),
+    "comment": (
+        Comment.objects.all(),
+        {
+            "id": "id",
+            "post": "post_id",
+            "author": "author__username",
+            "text": "text",
+            "created": "created",
+        },
+    ),
+    "follow": (
+        Follow.objects.all(),
+        {
+            "id": "id",
+            "user": "user__username",
+            "author": "author__username",
+        },
+    ),
+}
+
+
+def export_fields(model):
+    return list(EXPORTS[model][1])
+
+
+def _record(names, row):
+    return {
+        name: value.isoformat() if hasattr(value, "isoformat") else value
+        for name, value in zip(names, row)
+    }
+
+
+def export_records(model, chunk_size):
+    """Записи модели по порядку pk, выбираемые с сервера порциями
+    по chunk_size без кэша QuerySet."""
+
+    queryset, columns = EXPORTS[model]
+    rows = (
+        queryset.order_by("pk")
+        .values_list(*columns.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield _record(columns, row)
+
+
+def _change_columns(model):
+    return {"id": "id", **EXPORTS[model][1], "modified": "modified"}
+
+
+def change_fields(model):
+    return ["op", *_change_columns(model)]
+
+
+def parse_watermark(value):
+    """Время из строки ISO 8601, None для пустой строки.
+    ValueError, если строка не время."""
+
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"Неверное время: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def changes_until():
+    """Верхняя граница выгрузки изменений и следующий водяной знак."""
+
+    return timezone.now() - timedelta(seconds=CHANGES_LAG)
+
+
+def export_changes(model, since, until, chunk_size):
+    """Изменения модели в промежутке (since, until]: измененные
+    и новые записи с op="upsert" по порядку modified, затем удаленные
+    с op="delete", у которых есть только id и время удаления.
+    since=None выгружает все записи."""
+
+    queryset, _ = EXPORTS[model]
+    columns = _change_columns(model)
+    names = list(columns)
+    changed = queryset.filter(modified__lte=until)
+    deleted = Tombstone.objects.filter(model=model, deleted__lte=until)
+    if since is not None:
+        changed = changed.filter(modified__gt=since)
+        deleted = deleted.filter(deleted__gt=since)
+    rows = (
+        changed.order_by("modified", "pk")
+        .values_list(*columns.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield {"op": "upsert", **_record(names, row)}
+    rows = deleted.values_list("object_id", "deleted").iterator(
+        chunk_size=chunk_size
+    )
+    for row in rows:
+        yield {"op": "delete", **_record(("id", "modified"), row)}
+
+
+def write_records(stream, data_format, fields, records):
+    """Пишет записи в JSONL или CSV, возвращает их число."""
+
+    count = 0
+    if data_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for count, record in enumerate(records, 1):
+            writer.writerow(record)
+        return count
+    for count, record in enumerate(records, 1):
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return count
@@ -0,0 +1,146 @@
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+FEED_CACHE_TIMEOUT = getattr(settings, "FEED_CACHE_TIMEOUT", 60 * 60 * 24)
+
+VERSION_KEY = "posts:version:{}"
+
+# Области кэша. Версия области увеличивается сигналами posts.signals
+# при любой записи, которая меняет ее содержимое, поэтому фрагменты
+# с версией в ключе можно хранить долго и не отдавать устаревшими.
+INDEX = "index"
+GROUPS = "groups"
+
+
+def group_scope(group_id):
+    return f"group:{group_id}"
+
+
+def author_scope(author_id):
+    return f"author:{author_id}"
+
+
+def post_scope(post_id):
+    return f"post:{post_id}"
+
+
+def follow_scope(user_id):
+    return f"follow:{user_id}"
+
+
+def post_scopes(post, *group_ids):
+    """Области, которые надо сбросить при изменении поста."""
+
+    scopes = [INDEX, author_scope(post.author_id), post_scope(post.pk)]
+    scopes.extend(
+        group_scope(group_id)
+        for group_id in set(group_ids)
+        if group_id is not None
+    )
+    return scopes
+
+
+def _initial_version():
+    # Начинаем со времени, а не с единицы: после вытеснения ключа
+    # из кэша версия не повторит уже выданную.
+    return time.time_ns()
+
+
+def _get_many(template, scopes, initial):
+    keys = [template.format(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, initial(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def get_version(*scopes):
+    """Возвращает общую версию для набора областей одной строкой."""
+
+    versions = _get_many(VERSION_KEY, scopes, _initial_version)
+    return ".".join(str(version) for version in versions)
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def bump(*scopes):
+    """Увеличивает версии областей.
+
+    Внутри транзакции версия увеличивается сразу и еще раз после
+    коммита: иначе параллельный запрос успел бы закэшировать
+    данные, прочитанные до коммита, уже под новой версией."""
+
+    scopes = [scope for scope in scopes if scope is not None]
+    _bump(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(partial(_bump, scopes))
+
+
+def fragment_context(*scopes):
+    """Переменные для тега {% cache %} в шаблонах лент."""
+
+    return {
+        "cache_timeout": FEED_CACHE_TIMEOUT,
+        "cache_version": get_version(*scopes),
+    }
+
+
+def _viewer(request):
+    # Страница зависит от пользователя, а форма - от его CSRF-cookie,
+    # которая меняется при входе.
+    if not request.user.is_authenticated:
+        return "anonymous"
+    token = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    return f"{request.user.pk}:{token}"
+
+
+def conditional(load):
+    """Декоратор условного GET для страниц из областей кэша.
+
+    load(request, *args, **kwargs) загружает объект страницы (группу,
+    автора, пост) и возвращает его вместе со списком областей.
+    Объект доступен представлению как request.page_object.
+
+    ETag строится из версий областей и пользователя. На совпадающий
+    If-None-Match страница отвечает 304 Not Modified без рендеринга.
+    Last-Modified не отдается: каждая страница зависит от того, кто
+    вошел, а время изменения этого не учитывает, и по одному
+    If-Modified-Since после входа или выхода вернулся бы 304
+    со страницей другого пользователя."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            request.page_object, scopes = load(request, *args, **kwargs)
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            validator = f"{get_version(*scopes)}|{_viewer(request)}"
+            etag = quote_etag(hashlib.md5(validator.encode()).hexdigest())
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.setdefault("ETag", etag)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,96 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStat, Comment, Follow, Group, Post, User
+
+
+def _added(field, delta):
+    # Счетчик мог разойтись с данными (bulk_create не шлет сигналов),
+    # а отрицательное значение нарушило бы CHECK положительного поля.
+    return Greatest(F(field) + delta, 0)
+
+
+def _change_author_stat(user_id, field, delta):
+    """Изменяет счетчик field автора на delta.
+    Если строки статистики еще нет, при увеличении создает ее
+    с реальными значениями. При уменьшении не создает: строку мог
+    только что удалить каскад вместе с пользователем."""
+
+    updated = AuthorStat.objects.filter(user_id=user_id).update(
+        **{field: _added(field, delta)}
+    )
+    if not updated and delta > 0:
+        AuthorStat.objects.get_or_create(
+            user_id=user_id,
+            defaults={
+                "posts_count": Post.objects.filter(author_id=user_id).count(),
+                "followers_count": Follow.objects.filter(
+                    author_id=user_id
+                ).count(),
+            },
+        )
+
+
+def change_author_posts(user_id, delta):
+    """Изменяет счетчик постов автора на delta."""
+
+    _change_author_stat(user_id, "posts_count", delta)
+
+
+def change_author_followers(user_id, delta):
+    """Изменяет счетчик подписчиков автора на delta."""
+
+    _change_author_stat(user_id, "followers_count", delta)
+
+
+def change_group_posts(group_id, delta):
+    """Изменяет счетчик постов группы на delta."""
+
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=_added("posts_count", delta)
+        )
+
+
+def change_post_comments(post_id, delta):
+    """Изменяет счетчик комментариев поста на delta."""
+
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_added("comments_count", delta)
+    )
+
+
+def _count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def rebuild_counters():
+    """Пересчитывает все счетчики по данным таблиц.
+    Возвращает количество обновленных авторов, групп и постов."""
+
+    missing = User.objects.filter(stat__isnull=True).values_list(
+        "pk", flat=True
+    )
+    AuthorStat.objects.bulk_create(
+        AuthorStat(user_id=user_id) for user_id in missing.iterator()
+    )
+    authors = AuthorStat.objects.update(
+        posts_count=_count_subquery(Post.objects.all(), "author"),
+        followers_count=_count_subquery(Follow.objects.all(), "author"),
+    )
+    groups = Group.objects.update(
+        posts_count=_count_subquery(Post.objects.all(), "group")
+    )
+    posts = Post.objects.update(
+        comments_count=_count_subquery(Comment.objects.all(), "post")
+    )
+    return authors, groups, posts
@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AuthorStat, FeedEntry, Follow, Post
+
+FOLLOW_FEED_MATERIALIZED = getattr(
+    settings, "FOLLOW_FEED_MATERIALIZED", False
+)
+FOLLOW_FEED_FANOUT_LIMIT = getattr(settings, "FOLLOW_FEED_FANOUT_LIMIT", 1000)
+FOLLOW_FEED_BACKFILL = getattr(settings, "FOLLOW_FEED_BACKFILL", 200)
+
+
+def prolific_followed(user):
+    """Авторы, на которых подписан user и у которых больше
+    FOLLOW_FEED_FANOUT_LIMIT подписчиков. Их посты не раскладываются
+    по лентам, а подмешиваются при чтении."""
+
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stat__followers_count__gt=FOLLOW_FEED_FANOUT_LIMIT,
+        ).values_list("author", flat=True)
+    )
+
+
+def is_prolific(author_id):
+    return AuthorStat.objects.filter(
+        user_id=author_id, followers_count__gt=FOLLOW_FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """Раскладывает посты по лентам подписчиков их авторов
+    одним запросом подписок и одной вставкой."""
+
+    if not FOLLOW_FEED_MATERIALIZED or not posts:
+        return
+    authors = {post.author_id for post in posts}
+    authors -= set(
+        AuthorStat.objects.filter(
+            user_id__in=authors,
+            followers_count__gt=FOLLOW_FEED_FANOUT_LIMIT,
+        ).values_list("user_id", flat=True)
+    )
+    followers = {}
+    for user_id, author_id in Follow.objects.filter(
+        author_id__in=authors
+    ).values_list("user", "author"):
+        followers.setdefault(author_id, []).append(user_id)
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                created=post.created,
+            )
+            for post in posts
+            for user_id in followers.get(post.author_id, ())
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние
+    FOLLOW_FEED_BACKFILL постов автора."""
+
+    if not FOLLOW_FEED_MATERIALIZED or is_prolific(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "pk", "created"
+    )[:FOLLOW_FEED_BACKFILL]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                created=created,
+            )
+            for post_id, created in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def catch_up(author_id):
+    """Вызывается после отписки от автора. Если подписчиков стало
+    ровно FOLLOW_FEED_FANOUT_LIMIT, автор перестал быть популярным:
+    его посты больше не подмешиваются при чтении, поэтому последние
+    FOLLOW_FEED_BACKFILL постов, не разложенные, пока он был
+    популярным, добавляются в ленты всех подписчиков."""
+
+    if not FOLLOW_FEED_MATERIALIZED or not AuthorStat.objects.filter(
+        user_id=author_id, followers_count=FOLLOW_FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list(
+            "pk", "created"
+        )[:FOLLOW_FEED_BACKFILL]
+    )
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        "user", flat=True
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                created=created,
+            )
+            for user_id in followers.iterator()
+            for post_id, created in posts
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """Пересобирает все ленты заново по текущим подпискам."""
+
+    FeedEntry.objects.all().delete()
+    follows = Follow.objects.values_list("user", "author")
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+
+
+def follow_feed(user):
+    """Посты авторов, на которых подписан user.
+
+    В материализованном режиме лента читается из FeedEntry по индексу
+    (user, -created), а посты популярных авторов подмешиваются
+    при чтении (гибридный fan-out on read)."""
+
+    if not FOLLOW_FEED_MATERIALIZED:
+        followed_people = Follow.objects.filter(user=user).values("author")
+        return Post.objects.filter(author__in=followed_people)
+
+    prolific = prolific_followed(user)
+    if not prolific:
+        # сортировка по той же записи ленты, что и фильтр,
+        # чтобы порядок давал индекс, а не сортировка всех постов
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            "-feed_entries__created"
+        )
+    inbox = FeedEntry.objects.filter(user=user).values("post")
+    return Post.objects.filter(Q(pk__in=inbox) | Q(author__in=prolific))
@@ -1,10 +1,98 @@
+import os
+from io import BytesIO
+
 from django import forms
 from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
 
 from .models import Comment, Post
 
 POST_MIN_LEN = getattr(settings, "POST_MIN_LEN", None)
 COMMENT_MIN_LEN = getattr(settings, "COMMENT_MIN_LEN", None)
+POST_IMAGE_MAX_SIZE = getattr(settings, "POST_IMAGE_MAX_SIZE", None)
+POST_IMAGE_MAX_PIXELS = getattr(settings, "POST_IMAGE_MAX_PIXELS", None)
+POST_IMAGE_MAX_RESOLUTION = getattr(
+    settings, "POST_IMAGE_MAX_RESOLUTION", None
+)
+POST_IMAGE_FORMAT = getattr(settings, "POST_IMAGE_FORMAT", "JPEG")
+
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png"}
+
+
+class PostImageField(forms.ImageField):
+    """Поле картинки поста.
+
+    Размер файла и размеры картинки проверяются до ее разбора:
+    размеры Pillow читает из заголовка, не распаковывая растр,
+    поэтому огромная картинка отклоняется без затрат памяти.
+    """
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+        if POST_IMAGE_MAX_SIZE and data.size > POST_IMAGE_MAX_SIZE:
+            raise forms.ValidationError(
+                "Размер файла не должен превышать "
+                f"{filesizeformat(POST_IMAGE_MAX_SIZE)}."
+            )
+        if POST_IMAGE_MAX_PIXELS:
+            try:
+                with Image.open(data) as image:
+                    width, height = image.size
+            except Image.DecompressionBombError:
+                width = height = None
+            except Exception:
+                # не картинка, ошибку вернет ImageField
+                width = height = 0
+            data.seek(0)
+            if width is None or width * height > POST_IMAGE_MAX_PIXELS:
+                raise forms.ValidationError(
+                    "Слишком большая картинка: не более "
+                    f"{POST_IMAGE_MAX_PIXELS} пикселей."
+                )
+        return super().to_python(data)
+
+
+def shrink_image(upload):
+    """Уменьшает картинку до POST_IMAGE_MAX_RESOLUTION по большей стороне
+    и перекодирует в POST_IMAGE_FORMAT. Маленькие и анимированные
+    картинки возвращает как есть."""
+
+    if not POST_IMAGE_MAX_RESOLUTION:
+        return upload
+    limit = (POST_IMAGE_MAX_RESOLUTION, POST_IMAGE_MAX_RESOLUTION)
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if max(image.size) <= POST_IMAGE_MAX_RESOLUTION or getattr(
+            image, "is_animated", False
+        ):
+            upload.seek(0)
+            return upload
+        # JPEG умеет распаковаться сразу в уменьшенном масштабе
+        image.draft("RGB", limit)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(limit, Image.LANCZOS)
+        if POST_IMAGE_FORMAT == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        content = BytesIO()
+        image.save(
+            content,
+            POST_IMAGE_FORMAT,
+            quality=85,
+            optimize=True,
+            progressive=True,
+        )
+    name = "{}.{}".format(
+        os.path.splitext(upload.name)[0],
+        IMAGE_EXTENSIONS.get(POST_IMAGE_FORMAT, POST_IMAGE_FORMAT.lower()),
+    )
+    return SimpleUploadedFile(
+        name,
+        content.getvalue(),
+        content_type=Image.MIME.get(POST_IMAGE_FORMAT),
+    )
 
 
 class PostForm(forms.ModelForm):
@@ -13,6 +101,7 @@ class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ["text", "group", "image"]
+        field_classes = {"image": PostImageField}
 
     def clean_text(self):
         data = self.cleaned_data["text"]
@@ -24,6 +113,14 @@ class PostForm(forms.ModelForm):
 
         return data
 
+    def clean_image(self):
+        data = self.cleaned_data["image"]
+
+        if isinstance(data, UploadedFile):
+            return shrink_image(data)
+
+        return data
+
 
 class CommentForm(forms.ModelForm):
     """Форма добавления комментария."""
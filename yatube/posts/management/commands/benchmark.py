@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from core import sqlite
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает временную базу с синтетическими данными, прогоняет "
+        "сценарии страниц с заданной параллельностью и выводит "
+        "перцентили задержек, пропускную способность и число запросов "
+        "к базе. Результат можно сохранить как эталон и сравнить с ним."
+    )
+
+    def add_arguments(self, parser):
+        sizes = parser.add_argument_group("данные")
+        sizes.add_argument("--users", type=int, default=50)
+        sizes.add_argument("--groups", type=int, default=5)
+        sizes.add_argument("--posts", type=int, default=1000)
+        sizes.add_argument("--comments", type=int, default=2000)
+        sizes.add_argument("--follows", type=int, default=200)
+        sizes.add_argument(
+            "--images",
+            type=float,
+            default=0.1,
+            help="Доля постов с картинкой.",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=benchmark.SCENARIOS,
+            help="Сценарий, можно несколько. По умолчанию все.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Запросов на сценарий.",
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--sqlite-profile",
+            choices=("plain", "production"),
+            default="production" if sqlite.SQLITE_PRODUCTION else "plain",
+            help=(
+                "Подключения к SQLite без настройки или с профилем "
+                "продакшена: WAL, прагмы, постоянные подключения. "
+                "Для сравнения сохраните прогон одного через --output "
+                "и передайте его как --baseline прогону другого."
+            ),
+        )
+        parser.add_argument(
+            "--slow-io",
+            type=float,
+            default=0,
+            help="Задержка каждого запроса к базе и чтения из кэша в мс, "
+            "имитация медленного хранилища.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Куда сохранить JSON.")
+        parser.add_argument("--baseline", help="JSON эталона для сравнения.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Допустимый рост p95 относительно эталона.",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as stream:
+                baseline = json.load(stream)["scenarios"]
+
+        directory = tempfile.mkdtemp(prefix="yatube-benchmark-")
+        # отдельная база в файле: в памяти SQLite потоки мешают
+        # друг другу блокировками общего кэша
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            directory, "db.sqlite3"
+        )
+        caches = {
+            "default": {
+                **settings.CACHES["default"],
+                "LOCATION": os.path.join(directory, "cache.sqlite3"),
+            }
+        }
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(
+                    override_settings(
+                        MEDIA_ROOT=os.path.join(directory, "media"),
+                        CACHES=caches,
+                    )
+                )
+                stack.enter_context(
+                    sqlite.profile(options["sqlite_profile"] == "production")
+                )
+                report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(directory, ignore_errors=True)
+
+        for name, result in report["scenarios"].items():
+            self.stdout.write(
+                f"{name:14} p50 {result['p50_ms']:8.2f} мс  "
+                f"p95 {result['p95_ms']:8.2f} мс  "
+                f"p99 {result['p99_ms']:8.2f} мс  "
+                f"{result['throughput_rps']:8.1f} зап/с  "
+                f"{result['queries_per_request']:5.1f} SQL/зап  "
+                f"ошибок {result['errors']}"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            regressions = benchmark.compare(
+                report["scenarios"], baseline, options["tolerance"]
+            )
+            if regressions:
+                raise CommandError("Хуже эталона:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("Не хуже эталона."))
+
+    def run(self, options):
+        sizes = {
+            name: options[name]
+            for name in ("users", "groups", "posts", "comments", "follows")
+        }
+        dataset = benchmark.generate_dataset(
+            images=options["images"], seed=options["seed"], **sizes
+        )
+        with ExitStack() as stack:
+            if options["slow_io"]:
+                stack.enter_context(
+                    benchmark.slow_io(options["slow_io"] / 1000)
+                )
+            scenarios = benchmark.run_scenarios(
+                dataset,
+                names=options["scenario"] or benchmark.SCENARIOS,
+                requests=options["requests"],
+                concurrency=options["concurrency"],
+                seed=options["seed"],
+            )
+        return {
+            "dataset": {**sizes, "images": options["images"]},
+            "sqlite_profile": options["sqlite_profile"],
+            "slow_io_ms": options["slow_io"],
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "scenarios": scenarios,
+        }
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Меряет среднее время рендеринга страниц постов с загрузчиком "
+        "шаблонов без кэша и с кэшированным загрузчиком."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--template",
+            action="append",
+            help="Шаблон, можно несколько. По умолчанию страницы постов.",
+        )
+        parser.add_argument("--rounds", type=int, default=200)
+        parser.add_argument("--output", help="Куда сохранить JSON.")
+
+    def handle(self, *args, **options):
+        results = benchmark.render_templates(
+            names=options["template"] or benchmark.RENDER_TEMPLATES,
+            rounds=options["rounds"],
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:32} без кэша {result['plain_ms']:7.3f} мс  "
+                f"с кэшем {result['cached_ms']:7.3f} мс"
+            )
+        if options["output"]:
+            with open(options["output"], "w") as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
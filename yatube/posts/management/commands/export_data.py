@@ -0,0 +1,87 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает группы, посты, комментарии или подписки в JSONL "
+        "или CSV, читая базу порциями. С --since или --watermark "
+        "выгружает только изменения и удаления после водяного знака."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(bulk.EXPORTS))
+        parser.add_argument(
+            "path", help="Файл .jsonl или .csv, «-» для вывода в консоль."
+        )
+        parser.add_argument(
+            "--format",
+            choices=bulk.FORMATS,
+            help="Формат файла, по умолчанию по расширению или jsonl.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Сколько строк читать из базы за раз.",
+        )
+        parser.add_argument(
+            "--since",
+            help="Выгрузить изменения после этого времени (ISO 8601).",
+        )
+        parser.add_argument(
+            "--watermark",
+            help=(
+                "Файл водяного знака: изменения выгружаются после "
+                "записанного в нем времени, затем знак сдвигается. "
+                "Без файла выгружается все."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        data_format = options["format"] or (
+            "jsonl" if path == "-" else bulk.detect_format(path)
+        )
+        if data_format not in bulk.FORMATS:
+            raise CommandError(f"Неизвестный формат файла: {path}")
+
+        model = options["model"]
+        watermark = options["watermark"]
+        until = None
+        if options["since"] or watermark:
+            since = options["since"]
+            if not since and os.path.exists(watermark):
+                with open(watermark) as watermark_file:
+                    since = json.load(watermark_file)["until"]
+            try:
+                since = bulk.parse_watermark(since)
+            except ValueError as error:
+                raise CommandError(error)
+            until = bulk.changes_until()
+            records = bulk.export_changes(
+                model, since, until, options["chunk_size"]
+            )
+            fields = bulk.change_fields(model)
+        else:
+            records = bulk.export_records(model, options["chunk_size"])
+            fields = bulk.export_fields(model)
+
+        if path == "-":
+            bulk.write_records(self.stdout, data_format, fields, records)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as stream:
+                count = bulk.write_records(
+                    stream, data_format, fields, records
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f"Выгружено записей: {count}.")
+            )
+        if watermark:
+            # знак сдвигается только после успешной выгрузки
+            with open(watermark + ".tmp", "w") as watermark_file:
+                json.dump({"until": until.isoformat()}, watermark_file)
+            os.replace(watermark + ".tmp", watermark)
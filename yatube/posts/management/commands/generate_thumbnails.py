@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from core import tasks
+from django.core.management.base import BaseCommand
+from django.db import connections
+from posts import thumbnails
+from posts.models import Post
+from posts.tasks import THUMBNAILS
+
+
+class Command(BaseCommand):
+    help = "Создает миниатюры и варианты картинок всех постов на всех ядрах."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Число процессов, по умолчанию по числу ядер.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=16,
+            help="Сколько картинок отдавать процессу за раз.",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Не создавать здесь, а поставить в очередь задач "
+            "картинки, у которых еще нет вариантов.",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="")
+        if options["enqueue"]:
+            posts = posts.filter(image_variants__isnull=True)
+        names = list(
+            posts.order_by().values_list("image", flat=True).distinct()
+        )
+        if options["enqueue"]:
+            tasks.enqueue_many(THUMBNAILS, names, unique=True)
+            self.stdout.write(
+                self.style.SUCCESS(f"Поставлено в очередь: {len(names)}.")
+            )
+            return
+        # дочерние процессы не должны унаследовать открытые соединения
+        connections.close_all()
+        done = 0
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], initializer=django.setup
+        ) as executor:
+            results = executor.map(
+                thumbnails.generate_safely,
+                names,
+                chunksize=options["chunk_size"],
+            )
+            for name, ok in zip(names, results):
+                done += ok
+                if not ok:
+                    self.stderr.write(f"Ошибка: {name}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Создано миниатюр: {done} из {len(names)}.")
+        )
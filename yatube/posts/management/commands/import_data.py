@@ -0,0 +1,77 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает группы, посты, комментарии или подписки из JSONL "
+        "или CSV пачками. Прерванную загрузку можно продолжить "
+        "повторным запуском."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(bulk.IMPORTERS))
+        parser.add_argument("path", help="Файл .jsonl или .csv.")
+        parser.add_argument(
+            "--format",
+            choices=bulk.FORMATS,
+            help="Формат файла, по умолчанию по расширению.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Сколько записей вставлять одной транзакцией.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="Файл точки продолжения, по умолчанию <path>.checkpoint.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Начать с начала, не читая точку продолжения.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        data_format = options["format"] or bulk.detect_format(path)
+        if data_format not in bulk.FORMATS:
+            raise CommandError(f"Неизвестный формат файла: {path}")
+        checkpoint = options["checkpoint"] or path + ".checkpoint"
+
+        skip = 0
+        if not options["restart"] and os.path.exists(checkpoint):
+            with open(checkpoint) as checkpoint_file:
+                skip = json.load(checkpoint_file)["done"]
+            self.stdout.write(f"Продолжение с записи {skip + 1}.")
+
+        def save_checkpoint(done, inserted):
+            # запись во временный файл и замена, чтобы обрыв
+            # не оставил испорченную точку продолжения
+            with open(checkpoint + ".tmp", "w") as checkpoint_file:
+                json.dump({"done": done}, checkpoint_file)
+            os.replace(checkpoint + ".tmp", checkpoint)
+            self.stdout.write(
+                f"Обработано записей: {done}, добавлено: {inserted}."
+            )
+
+        with open(path, newline="", encoding="utf-8") as stream:
+            done, inserted = bulk.import_records(
+                options["model"],
+                bulk.read_records(stream, data_format),
+                options["batch_size"],
+                skip=skip,
+                on_batch=save_checkpoint,
+            )
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загружено: {inserted}, пропущено: "
+                f"{done - skip - inserted}."
+            )
+        )
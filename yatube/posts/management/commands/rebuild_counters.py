@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счетчики постов и подписчиков авторов, "
+        "постов групп и комментариев."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            authors, groups, posts = rebuild_counters()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Обновлено: авторов {authors}, групп {groups}, "
+                f"постов {posts}."
+            )
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = "Пересобирает материализованные ленты подписок."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            feed.rebuild()
+        self.stdout.write(self.style.SUCCESS("Ленты подписок пересобраны."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from posts import search
+
+
+class Command(BaseCommand):
+    help = "Заново строит полнотекстовый индекс постов."
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError("Индекс FTS5 доступен только для SQLite.")
+        with transaction.atomic():
+            count = search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Проиндексировано постов: {count}.")
+        )
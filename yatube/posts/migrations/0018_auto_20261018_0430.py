@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStat = apps.get_model('posts', 'AuthorStat')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    for user in User.objects.annotate(total=models.Count('posts')):
+        AuthorStat.objects.create(user=user, posts_count=user.total)
+    for group in Group.objects.annotate(total=models.Count('posts')):
+        Group.objects.filter(pk=group.pk).update(posts_count=group.total)
+    posts = Post.objects.annotate(total=models.Count('comments')).filter(
+        total__gt=0
+    )
+    for post in posts:
+        Post.objects.filter(pk=post.pk).update(comments_count=post.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStat',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stat', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Количество постов')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
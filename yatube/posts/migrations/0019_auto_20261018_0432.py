@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_followers_and_feeds(apps, schema_editor):
+    AuthorStat = apps.get_model('posts', 'AuthorStat')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    limit = getattr(settings, 'FOLLOW_FEED_BACKFILL', 200)
+    for follow in Follow.objects.all():
+        AuthorStat.objects.filter(user_id=follow.author_id).update(
+            followers_count=models.F('followers_count') + 1
+        )
+        posts = Post.objects.filter(author_id=follow.author_id).order_by(
+            '-created'
+        )[:limit]
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(
+                    user_id=follow.user_id,
+                    post_id=post.pk,
+                    author_id=follow.author_id,
+                    created=post.created,
+                )
+                for post in posts
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_auto_20261018_0430'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstat',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество подписчиков'),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(verbose_name='Дата создания поста')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-created'], name='posts_feede_user_id_de4f5a_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='feedentry',
+            unique_together={('user', 'post')},
+        ),
+        migrations.RunPython(
+            fill_followers_and_feeds, migrations.RunPython.noop
+        ),
+    ]
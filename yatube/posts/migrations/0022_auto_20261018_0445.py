@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    AuthorStat = apps.get_model('posts', 'AuthorStat')
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = (
+        Follow.objects.values('user_id', 'author_id')
+        .annotate(first_id=models.Min('id'), total=models.Count('id'))
+        .filter(total__gt=1)
+    )
+    authors = set()
+    for duplicate in duplicates:
+        Follow.objects.filter(
+            user_id=duplicate['user_id'], author_id=duplicate['author_id']
+        ).exclude(id=duplicate['first_id']).delete()
+        authors.add(duplicate['author_id'])
+    for author_id in authors:
+        AuthorStat.objects.filter(user_id=author_id).update(
+            followers_count=Follow.objects.filter(author_id=author_id).count()
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'created'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'created'], name='post_group_created_idx'),
+        ),
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+def modified_from_created(apps, schema_editor):
+    for name in ('Post', 'Comment'):
+        model = apps.get_model('posts', name)
+        model.objects.update(modified=models.F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_auto_20261018_0445'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20, verbose_name='Модель')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id записи')),
+                ('deleted', models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удаленная запись',
+                'verbose_name_plural': 'Удаленные записи',
+                'ordering': ('deleted',),
+            },
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='follow',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'deleted'], name='tombstone_model_idx'),
+        ),
+        migrations.RunPython(modified_from_created, migrations.RunPython.noop),
+    ]
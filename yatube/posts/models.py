@@ -1,11 +1,11 @@
-from core.models import CreatedModel
+from core.models import CreatedModel, ModifiedModel
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class Group(ModifiedModel):
     title = models.CharField(
         max_length=200,
         verbose_name="Название",
@@ -19,12 +19,37 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name="Описание", help_text="Введите описание группы"
     )
+    posts_count = models.PositiveIntegerField(
+        "Количество постов", default=0, editable=False
+    )
 
     def __str__(self) -> str:
         return self.title
 
 
-class Post(CreatedModel):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа загружаются тем же запросом,
+        варианты картинок - одним дополнительным, неиспользуемые
+        шаблонами ленты колонки не читаются."""
+
+        return (
+            self.select_related("author", "group")
+            .prefetch_related("image_variants")
+            .defer(
+                "author__password",
+                "author__last_login",
+                "author__is_superuser",
+                "author__email",
+                "author__is_staff",
+                "author__is_active",
+                "author__date_joined",
+                "group__description",
+            )
+        )
+
+
+class Post(CreatedModel, ModifiedModel):
     text = models.TextField(
         verbose_name="Текст записи", help_text="Введите текст поста"
     )
@@ -44,9 +69,24 @@ class Post(CreatedModel):
         help_text="Выберите группу",
     )
     image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    comments_count = models.PositiveIntegerField(
+        "Количество комментариев", default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ("-created",)
+        # Индексы по возрастанию: при обратном проходе они дают порядок
+        # (-created, -pk) лент и курсорной пагинации без сортировки.
+        indexes = [
+            models.Index(
+                fields=["author", "created"], name="post_author_created_idx"
+            ),
+            models.Index(
+                fields=["group", "created"], name="post_group_created_idx"
+            ),
+        ]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
 
@@ -54,7 +94,33 @@ class Post(CreatedModel):
         return self.text[:15]
 
 
-class Comment(CreatedModel):
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста заданной ширины и формата
+    для атрибута srcset. Создается в фоне модулем posts.thumbnails."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="image_variants",
+        verbose_name="Пост",
+    )
+    source = models.CharField("Исходная картинка", max_length=100)
+    image = models.ImageField("Файл", max_length=255)
+    width = models.PositiveIntegerField("Ширина")
+    height = models.PositiveIntegerField("Высота")
+    format = models.CharField("Формат", max_length=10)
+
+    class Meta:
+        ordering = ("width",)
+        unique_together = ("post", "width", "format")
+        verbose_name = "Вариант картинки"
+        verbose_name_plural = "Варианты картинок"
+
+    def __str__(self) -> str:
+        return f"{self.image} {self.width}w"
+
+
+class Comment(CreatedModel, ModifiedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -73,6 +139,11 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            models.Index(
+                fields=["post", "created"], name="comment_post_created_idx"
+            ),
+        ]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
 
@@ -80,7 +151,28 @@ class Comment(CreatedModel):
         return self.text[:15]
 
 
-class Follow(models.Model):
+class FollowQuerySet(models.QuerySet):
+    def follow(self, user, author):
+        """Подписывает user на author одним INSERT. Повторная или
+        одновременная подписка упирается в уникальность пары и ничего
+        не меняет. Возвращает True, если подписка создана."""
+
+        try:
+            with transaction.atomic():
+                self.create(user=user, author=author)
+        except IntegrityError:
+            return False
+        return True
+
+    def unfollow(self, user, author):
+        """Удаляет подписку, если она есть. Возвращает True,
+        если подписка была."""
+
+        deleted, _ = self.filter(user=user, author=author).delete()
+        return bool(deleted)
+
+
+class Follow(ModifiedModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -93,3 +185,93 @@ class Follow(models.Model):
         related_name="following",
         verbose_name="Автор",
     )
+
+    objects = FollowQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_follow"
+            ),
+        ]
+
+
+class AuthorStat(models.Model):
+    """Счетчики автора, которые поддерживаются сигналами posts.signals,
+    чтобы не считать COUNT(*) по постам на каждой странице."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stat",
+        verbose_name="Автор",
+    )
+    posts_count = models.PositiveIntegerField("Количество постов", default=0)
+    followers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0
+    )
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+
+    def __str__(self) -> str:
+        return f"{self.user}: {self.posts_count}"
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок: пост автора,
+    разложенный во входящие подписчика (fan-out on write)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Подписчик",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="feed_entries",
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор",
+    )
+    created = models.DateTimeField("Дата создания поста")
+
+    class Meta:
+        ordering = ("-created",)
+        indexes = [models.Index(fields=["user", "-created"])]
+        unique_together = ("user", "post")
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи лент"
+
+    def __str__(self) -> str:
+        return f"{self.user} <- {self.post}"
+
+
+class Tombstone(models.Model):
+    """След удаленной группы, поста, комментария или подписки: по нему
+    инкрементальная выгрузка сообщает об удалении."""
+
+    model = models.CharField("Модель", max_length=20)
+    object_id = models.PositiveIntegerField("Id записи")
+    deleted = models.DateTimeField("Дата удаления", auto_now_add=True)
+
+    class Meta:
+        ordering = ("deleted",)
+        indexes = [
+            models.Index(
+                fields=["model", "deleted"], name="tombstone_model_idx"
+            ),
+        ]
+        verbose_name = "Удаленная запись"
+        verbose_name_plural = "Удаленные записи"
+
+    def __str__(self) -> str:
+        return f"{self.model} {self.object_id}"
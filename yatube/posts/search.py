@@ -0,0 +1,149 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+TABLE = "posts_post_fts"
+
+# Маркеры подсветки из области частного использования Unicode:
+# их не бывает в тексте, поэтому текст можно безопасно экранировать
+# и только потом заменить маркеры на теги.
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+WORD_RE = re.compile(r"\w+")
+
+
+def available():
+    """Полнотекстовый индекс есть только в SQLite (FTS5)."""
+
+    return connection.vendor == "sqlite"
+
+
+def index_post(post):
+    index_posts([post])
+
+
+def index_posts(posts):
+    if available() and posts:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {TABLE} (rowid, text) "
+                "VALUES (%s, %s)",
+                [(post.pk, post.text) for post in posts],
+            )
+
+
+def remove_post(post_id):
+    if available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid = %s", [post_id]
+            )
+
+
+def rebuild():
+    """Заново строит индекс по всем постам. Возвращает их число."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, text) "
+            f"SELECT id, text FROM {Post._meta.db_table}"
+        )
+        return cursor.rowcount
+
+
+def build_query(text):
+    """Превращает ввод пользователя в запрос FTS5: все слова
+    обязательны, последнее ищется и как начало слова.
+    Операторы FTS5 из ввода не проходят."""
+
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def match_sql(query):
+    """Подзапрос id постов, подходящих под запрос, для pk__in."""
+
+    return f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [query]
+
+
+def highlight(text):
+    return mark_safe(
+        escape(text)
+        .replace(MARK_START, "<mark>")
+        .replace(MARK_END, "</mark>")
+    )
+
+
+class SearchResults:
+    """Результаты поиска, упорядоченные по релевантности (bm25).
+
+    Подходит для Paginator: число результатов и страница считаются
+    по индексу отдельными запросами, посты страницы загружаются
+    одним запросом for_feed(), текст приходит с подсветкой слов."""
+
+    ordered = True
+
+    def __init__(self, text):
+        self.query = build_query(text)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.query:
+                self._count = 0
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT COUNT(*) FROM {TABLE} "
+                        f"WHERE {TABLE} MATCH %s",
+                        [self.query],
+                    )
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.query:
+            return []
+        start = key.start or 0
+        limit = -1 if key.stop is None else key.stop - start
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, highlight({TABLE}, 0, %s, %s) FROM {TABLE} "
+                f"WHERE {TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s",
+                [MARK_START, MARK_END, self.query, limit, start],
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+        results = []
+        for pk, text in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.highlighted = highlight(text)
+                results.append(post)
+        return results
+
+
+def search(text):
+    """Посты по запросу text: из индекса FTS5, а без него -
+    простым поиском подстроки."""
+
+    if available():
+        return SearchResults(text)
+    if not text.strip():
+        return Post.objects.none()
+    return Post.objects.for_feed().filter(text__icontains=text)
@@ -0,0 +1,207 @@
+from core import tasks
+from django.db.models import Q
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, counters, feed, search
+from .models import AuthorStat, Comment, Follow, Group, Post, Tombstone, User
+from .tasks import FAN_OUT, INDEX_POSTS, THUMBNAILS
+
+
+@receiver(post_save, sender=User)
+def create_author_stat(sender, instance, created, raw=False, **kwargs):
+    """Заводит строку счетчиков для нового пользователя."""
+
+    if created and not raw:
+        AuthorStat.objects.get_or_create(user=instance)
+
+
+USER_NAME_FIELDS = ("username", "first_name", "last_name")
+
+
+@receiver(post_init, sender=User)
+def remember_user_names(sender, instance, **kwargs):
+    """Запоминает загруженные имена пользователя, чтобы при сохранении
+    увидеть их смену. Отложенные поля не загружаются."""
+
+    instance._initial_names = {
+        field: instance.__dict__[field]
+        for field in USER_NAME_FIELDS
+        if field in instance.__dict__
+    }
+
+
+@receiver(post_save, sender=User)
+def user_renamed(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    """Имя автора выводится в лентах, на его странице и в постах,
+    а ник - еще и в комментариях. Сохранение без смены имен, например
+    last_login при входе, кэш не сбрасывает."""
+
+    if created or raw:
+        return
+    changed = {
+        field
+        for field, value in instance._initial_names.items()
+        if instance.__dict__.get(field, value) != value
+        and (update_fields is None or field in update_fields)
+    }
+    instance._initial_names.update(
+        (field, instance.__dict__[field]) for field in changed
+    )
+    if not changed:
+        return
+    scopes = [caching.INDEX, caching.author_scope(instance.pk)]
+    scopes.extend(
+        caching.group_scope(group_id)
+        for group_id in Post.objects.filter(author=instance)
+        .exclude(group=None)
+        .values_list("group", flat=True)
+        .distinct()
+    )
+    if "username" in changed:
+        scopes.extend(
+            caching.post_scope(post_id)
+            for post_id in Comment.objects.filter(author=instance)
+            .values_list("post", flat=True)
+            .distinct()
+        )
+        # ник выгружается в постах, комментариях и подписках: они
+        # должны попасть в выгрузку изменений
+        now = timezone.now()
+        Post.objects.filter(author=instance).update(modified=now)
+        Comment.objects.filter(author=instance).update(modified=now)
+        Follow.objects.filter(Q(user=instance) | Q(author=instance)).update(
+            modified=now
+        )
+    caching.bump(*scopes)
+
+
+@receiver(post_init, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    """Запоминает группу и картинку поста, чтобы при сохранении увидеть
+    их смену. Читаем из __dict__, чтобы не загружать отложенные поля."""
+
+    image = instance.__dict__.get("image")
+    instance._initial_group_id = instance.__dict__.get("group_id")
+    instance._initial_image = getattr(image, "name", image) or ""
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    """Обновляет счетчики автора и групп и версии кэша при создании
+    и изменении поста, ставит в очередь задач ленты подписчиков,
+    поисковый индекс и миниатюру новой картинки."""
+
+    if raw:
+        return
+    if created:
+        counters.change_author_posts(instance.author_id, 1)
+        counters.change_group_posts(instance.group_id, 1)
+        tasks.enqueue(FAN_OUT, instance.pk)
+    elif instance._initial_group_id != instance.group_id:
+        counters.change_group_posts(instance._initial_group_id, -1)
+        counters.change_group_posts(instance.group_id, 1)
+    tasks.enqueue(INDEX_POSTS, instance.pk)
+    if instance.image and instance.image.name != instance._initial_image:
+        tasks.enqueue(THUMBNAILS, instance.image.name, unique=True)
+    caching.bump(
+        *caching.post_scopes(
+            instance, instance._initial_group_id, instance.group_id
+        )
+    )
+    instance._initial_group_id = instance.group_id
+    instance._initial_image = instance.image.name or ""
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author_posts(instance.author_id, -1)
+    counters.change_group_posts(instance._initial_group_id, -1)
+    search.remove_post(instance.pk)
+    caching.bump(*caching.post_scopes(instance, instance._initial_group_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_post_comments(instance.post_id, 1)
+    caching.bump(caching.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post_comments(instance.post_id, -1)
+    caching.bump(caching.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    """Название и ссылка группы выводятся во всех лентах."""
+
+    if not raw:
+        caching.bump(caching.GROUPS, caching.group_scope(instance.pk))
+
+
+@receiver(post_init, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._initial_slug = instance.__dict__.get("slug")
+
+
+@receiver(post_save, sender=Group)
+def group_slug_changed(sender, instance, created, raw=False, **kwargs):
+    """Ссылка группы выгружается в постах: при ее смене посты должны
+    попасть в выгрузку изменений."""
+
+    if created or raw or instance._initial_slug == instance.slug:
+        return
+    instance._initial_slug = instance.slug
+    Post.objects.filter(group=instance).update(modified=timezone.now())
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    """Учитывает подписчика и наполняет его ленту постами автора."""
+
+    if created and not raw:
+        counters.change_author_followers(instance.author_id, 1)
+        feed.backfill(instance.user_id, instance.author_id)
+        caching.bump(caching.follow_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_author_followers(instance.author_id, -1)
+    feed.prune(instance.user_id, instance.author_id)
+    feed.catch_up(instance.author_id)
+    caching.bump(caching.follow_scope(instance.user_id))
+
+
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, **kwargs):
+    """Группа у постов обнулится UPDATE без сигналов и без даты
+    изменения, а посты должны попасть в выгрузку изменений."""
+
+    Post.objects.filter(group=instance).update(modified=timezone.now())
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+def leave_tombstone(sender, instance, **kwargs):
+    """Запоминает удаление для инкрементальной выгрузки."""
+
+    Tombstone.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk
+    )
@@ -0,0 +1,48 @@
+"""Обработчики фоновых задач постов (очередь core/tasks.py).
+
+Задачи ставятся сигналами после сохранения поста, миниатюры - еще
+и тегами post_images, если картинку показывают до их создания.
+В задачи вынесена работа, которая может подождать: поисковый индекс,
+раскладка по лентам подписчиков и миниатюры. Счетчики и версии кэша по-прежнему
+обновляются сразу, иначе автор не увидел бы свой пост.
+"""
+
+from core import tasks
+
+from . import feed, search, thumbnails
+from .models import Post
+
+INDEX_POSTS = "posts.index"
+FAN_OUT = "posts.fan_out"
+THUMBNAILS = "posts.thumbnails"
+
+
+@tasks.handler(INDEX_POSTS)
+def index_posts(post_ids):
+    # удаленные к этому времени посты просто не найдутся
+    search.index_posts(
+        list(Post.objects.filter(pk__in=set(post_ids)).only("pk", "text"))
+    )
+
+
+@tasks.handler(FAN_OUT)
+def fan_out(post_ids):
+    feed.fan_out_many(
+        list(
+            Post.objects.filter(pk__in=set(post_ids)).only(
+                "pk", "author_id", "created"
+            )
+        )
+    )
+
+
+def _schedule_thumbnails(names):
+    # без очереди миниатюры по-прежнему создает пул потоков
+    for name in names:
+        thumbnails.schedule(name)
+
+
+@tasks.handler(THUMBNAILS, inline=_schedule_thumbnails)
+def generate_thumbnails(names):
+    for name in set(names):
+        thumbnails.generate(name)
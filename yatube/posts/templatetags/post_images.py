@@ -0,0 +1,62 @@
+from django import template
+from PIL import Image
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    """Готовая миниатюра картинки поста, пока ее нет - оригинал.
+    Рендеринг ничего не создает и не ставит в очередь: миниатюры
+    заказывают сохранение поста, импорт и generate_thumbnails."""
+
+    thumbnail = thumbnails.ready_thumbnail(image)
+    return image if thumbnail is None else thumbnail
+
+
+@register.inclusion_tag("posts/includes/post_picture.html")
+def post_picture(post, sizes="100vw"):
+    """Картинка поста с srcset из готовых вариантов: браузер сам
+    выбирает наименьший подходящий. Пока вариантов нет, выводит
+    миниатюру или оригинал."""
+
+    variants = [
+        variant
+        for variant in post.image_variants.all()
+        if variant.source == post.image.name
+    ]
+    if not variants:
+        return {"src": post_thumbnail(post.image).url}
+
+    by_format = {}
+    for variant in variants:
+        by_format.setdefault(variant.format, []).append(variant)
+    # последний формат из настройки понимают все браузеры
+    fallback_format = next(
+        (
+            image_format
+            for image_format in reversed(thumbnails.POST_IMAGE_VARIANT_FORMATS)
+            if image_format in by_format
+        ),
+        next(iter(by_format)),
+    )
+    fallback = by_format.pop(fallback_format)
+    largest = fallback[-1]
+    return {
+        "sources": [
+            {"type": Image.MIME.get(image_format), "srcset": _srcset(items)}
+            for image_format, items in by_format.items()
+        ],
+        "src": largest.image.url,
+        "srcset": _srcset(fallback),
+        "sizes": sizes,
+        "width": largest.width,
+        "height": largest.height,
+    }
+
+
+def _srcset(variants):
+    return ", ".join(
+        f"{variant.image.url} {variant.width}w" for variant in variants
+    )
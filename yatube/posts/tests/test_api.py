@@ -0,0 +1,77 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="TestAuthor", first_name="Автор"
+        )
+        cls.group = Group.objects.create(
+            title="Группа", slug="test-slug", description="Описание"
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f"Пост {index}"
+            )
+            for index in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text="Комментарий"
+        )
+
+    def get(self, address, **params):
+        response = self.client.get(address, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсор next проходит ленту без пропусков и повторов."""
+
+        data = self.get(reverse("posts:api_posts"), limit=2)
+        texts = [post["text"] for post in data["results"]]
+        while data["next"]:
+            data = self.get(data["next"])
+            texts.extend(post["text"] for post in data["results"])
+        self.assertEqual(
+            texts, [f"Пост {index}" for index in reversed(range(5))]
+        )
+
+    def test_sparse_fields(self):
+        data = self.get(
+            reverse("posts:api_group", kwargs={"slug": "test-slug"}),
+            fields="id,author",
+        )
+        self.assertEqual(data["group"]["title"], "Группа")
+        self.assertEqual(
+            data["results"][0],
+            {"id": self.posts[-1].pk, "author": "TestAuthor"},
+        )
+        response = self.client.get(
+            reverse("posts:api_posts"), {"fields": "id,password"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_and_comments(self):
+        data = self.get(
+            reverse("posts:api_profile", kwargs={"username": "TestAuthor"})
+        )
+        self.assertEqual(data["author"]["posts_count"], 5)
+        self.assertEqual(len(data["results"]), 5)
+
+        with self.assertNumQueries(2):
+            data = self.get(
+                reverse(
+                    "posts:api_comments",
+                    kwargs={"post_id": self.posts[0].pk},
+                )
+            )
+        self.assertEqual(data["results"][0]["text"], "Комментарий")
+        self.assertIsNone(data["next"])
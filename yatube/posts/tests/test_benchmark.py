@@ -0,0 +1,52 @@
+from django.test import TestCase
+from posts import benchmark
+from posts.models import Comment, Post
+
+
+class BenchmarkTests(TestCase):
+    def test_generate_and_run_scenarios(self):
+        """Синтетические данные создаются, сценарии отрабатывают
+        без ошибок и дают все метрики."""
+
+        dataset = benchmark.generate_dataset(
+            users=5, groups=2, posts=20, comments=10, follows=5, images=0
+        )
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Comment.objects.count(), 10)
+
+        results = benchmark.run_scenarios(dataset, requests=3, concurrency=1)
+        self.assertEqual(set(results), set(benchmark.SCENARIOS))
+        for name, result in results.items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result["requests"], 3)
+                self.assertEqual(result["errors"], 0)
+                self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+                self.assertGreater(result["queries_per_request"], 0)
+
+    def test_compare_reports_regressions(self):
+        baseline = {"index": {"p95_ms": 10.0, "queries_per_request": 3}}
+        self.assertEqual(
+            benchmark.compare(
+                {"index": {"p95_ms": 11.0, "queries_per_request": 3}},
+                baseline,
+            ),
+            [],
+        )
+        self.assertEqual(
+            len(
+                benchmark.compare(
+                    {"index": {"p95_ms": 13.0, "queries_per_request": 4}},
+                    baseline,
+                )
+            ),
+            2,
+        )
+
+    def test_render_templates(self):
+        """Замер рендеринга дает время без кэша и с кэшем шаблонов."""
+
+        results = benchmark.render_templates(rounds=2)
+        self.assertEqual(set(results), set(benchmark.RENDER_TEMPLATES))
+        for result in results.values():
+            self.assertGreater(result["plain_ms"], 0)
+            self.assertGreater(result["cached_ms"], 0)
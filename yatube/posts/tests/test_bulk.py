@@ -0,0 +1,262 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from posts import bulk, search
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class BulkImportExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="TestAuthor")
+        cls.follower = User.objects.create_user(username="TestFollower")
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(content)
+        return path
+
+    def load(self, *args):
+        call_command("import_data", *args, "--batch-size=2", stdout=StringIO())
+
+    def test_import_keeps_counters_feeds_and_index(self):
+        """Импорт пачками обновляет счетчики, ленты и поиск."""
+
+        self.load(
+            "group",
+            self.write(
+                "groups.jsonl",
+                '{"title": "Группа", "slug": "testslug"}\n',
+            ),
+        )
+        self.load(
+            "follow",
+            self.write(
+                "follows.csv", "user,author\nTestFollower,TestAuthor\n"
+            ),
+        )
+        self.load(
+            "post",
+            self.write(
+                "posts.csv",
+                "author,group,text,created\n"
+                "TestAuthor,testslug,Первый импорт,2020-01-01T10:00:00\n"
+                "TestAuthor,,Второй импорт,2020-01-02T10:00:00\n"
+                "TestAuthor,,Третий импорт,\n"
+                "Unknown,,Пропущенный пост,\n",
+            ),
+        )
+        post = Post.objects.get(text="Первый импорт")
+        self.load(
+            "comment",
+            self.write(
+                "comments.jsonl",
+                json.dumps(
+                    {"post": post.pk, "author": "TestFollower", "text": "Ок"}
+                )
+                + "\n",
+            ),
+        )
+
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(post.created.year, 2020)
+        self.author.stat.refresh_from_db()
+        self.assertEqual(self.author.stat.posts_count, 3)
+        self.assertEqual(self.author.stat.followers_count, 1)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.follower.feed_entries.count(), 3)
+        self.assertEqual(search.SearchResults("импорт").count(), 3)
+
+    def test_import_ids_skip_explicit_and_deleted(self):
+        """Новые id не совпадают с явными id пачки и с id удаленных
+        записей."""
+
+        deleted = Post.objects.create(author=self.author, text="Удален")
+        deleted_id = deleted.pk
+        deleted.delete()
+        self.load(
+            "post",
+            self.write(
+                "posts.jsonl",
+                json.dumps({"author": "TestAuthor", "text": "Новый"})
+                + "\n"
+                + json.dumps(
+                    {
+                        "id": deleted_id + 1,
+                        "author": "TestAuthor",
+                        "text": "С id",
+                    }
+                )
+                + "\n",
+            ),
+        )
+        self.assertEqual(Post.objects.get(text="С id").pk, deleted_id + 1)
+        self.assertGreater(Post.objects.get(text="Новый").pk, deleted_id + 1)
+
+    def test_import_resumes_from_checkpoint(self):
+        """Повторный запуск продолжает с сохраненной записи."""
+
+        path = self.write(
+            "posts.jsonl",
+            "".join(
+                json.dumps({"author": "TestAuthor", "text": f"Пост {i}"})
+                + "\n"
+                for i in range(5)
+            ),
+        )
+        self.write("posts.jsonl.checkpoint", '{"done": 2}')
+        self.load("post", path)
+        self.assertEqual(
+            sorted(Post.objects.values_list("text", flat=True)),
+            ["Пост 2", "Пост 3", "Пост 4"],
+        )
+        self.assertFalse(os.path.exists(path + ".checkpoint"))
+
+    def test_export_streams_records(self):
+        """Экспорт выгружает записи в формате импорта."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        Comment.objects.create(
+            post=Post.objects.create(author=self.author, text="Пост"),
+            author=self.follower,
+            text="Комментарий",
+        )
+        out = StringIO()
+        call_command("export_data", "comment", "-", stdout=out)
+        record = json.loads(out.getvalue())
+        self.assertEqual(record["author"], "TestFollower")
+        self.assertEqual(record["text"], "Комментарий")
+
+        path = os.path.join(self.directory, "follows.csv")
+        call_command("export_data", "follow", path, stdout=StringIO())
+        with open(path, encoding="utf-8") as stream:
+            self.assertEqual(
+                stream.read().splitlines(),
+                [
+                    "id,user,author",
+                    f"{Follow.objects.get().pk},TestFollower,TestAuthor",
+                ],
+            )
+
+
+@mock.patch.object(bulk, "CHANGES_LAG", 0)
+class IncrementalExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="TestAuthor")
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.post = Post.objects.create(author=self.author, text="Пост")
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.author, text="Комментарий"
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, model, watermark):
+        out = StringIO()
+        call_command(
+            "export_data", model, "-", f"--watermark={watermark}", stdout=out
+        )
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_only_changes_after_watermark(self):
+        """Вторая выгрузка содержит только измененные и удаленные
+        после первой записи."""
+
+        watermark = os.path.join(self.directory, "posts.watermark")
+        self.assertEqual(len(self.export("post", watermark)), 1)
+        self.assertEqual(self.export("post", watermark), [])
+
+        self.post.text = "Исправленный пост"
+        self.post.save()
+        Post.objects.create(author=self.author, text="Удаленный").delete()
+
+        records = self.export("post", watermark)
+        self.assertEqual(
+            [(record["op"], record["id"]) for record in records][0],
+            ("upsert", self.post.pk),
+        )
+        self.assertEqual(records[0]["text"], "Исправленный пост")
+        self.assertEqual(records[1]["op"], "delete")
+        self.assertEqual(len(records), 2)
+
+    def test_renames_reach_dependent_rows(self):
+        """Смена ника автора и ссылки группы попадает в выгрузку постов
+        и комментариев, хотя сами строки не сохранялись."""
+
+        group = Group.objects.create(title="Группа", slug="old")
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        posts = os.path.join(self.directory, "posts.watermark")
+        comments = os.path.join(self.directory, "comments.watermark")
+        self.export("post", posts)
+        self.export("comment", comments)
+
+        group.slug = "new"
+        group.save()
+        [record] = self.export("post", posts)
+        self.assertEqual(record["group"], "new")
+
+        author = User.objects.get(pk=self.author.pk)
+        author.username = "Renamed"
+        author.save()
+        [record] = self.export("post", posts)
+        self.assertEqual(record["author"], "Renamed")
+        [record] = self.export("comment", comments)
+        self.assertEqual(record["author"], "Renamed")
+
+    def test_cascade_deletions_leave_tombstones(self):
+        watermark = os.path.join(self.directory, "comments.watermark")
+        self.export("comment", watermark)
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(
+            self.export("comment", watermark),
+            [
+                {
+                    "op": "delete",
+                    "id": self.comment.pk,
+                    "modified": mock.ANY,
+                }
+            ],
+        )
+
+    def test_changes_api_for_staff(self):
+        address = reverse("posts:changes", kwargs={"model": "comment"})
+        self.assertEqual(self.client.get(address).status_code, 404)
+
+        self.client.force_login(
+            User.objects.create_user(username="staff", is_staff=True)
+        )
+        response = self.client.get(address)
+        self.assertIn("X-Watermark", response)
+        records = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(records[0]["text"], "Комментарий")
+        response = self.client.get(
+            address, {"since": response["X-Watermark"]}
+        )
+        self.assertEqual(b"".join(response.streaming_content), b"")
@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import feed
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+@mock.patch.object(feed, "FOLLOW_FEED_MATERIALIZED", True)
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username="TestFollower")
+        cls.author = User.objects.create_user(username="TestAuthor")
+        cls.old_post = Post.objects.create(
+            author=cls.author, text="Запись до подписки"
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def feed_pks(self):
+        response = self.follower_client.get(reverse("posts:follow_index"))
+        return [post.pk for post in response.context["page_obj"]]
+
+    def test_follow_backfills_and_new_post_fans_out(self):
+        """Подписка добавляет старые посты автора в ленту,
+        новые посты раскладываются в ленту при публикации."""
+
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(
+            author=self.author, text="Запись после подписки"
+        )
+
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.follower).count(), 2
+        )
+        self.assertEqual(self.feed_pks(), [new_post.pk, self.old_post.pk])
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты."""
+
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        follow.delete()
+
+        self.assertFalse(FeedEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.feed_pks(), [])
+
+    def test_prolific_author_read_on_the_fly(self):
+        """Посты авторов с множеством подписчиков не раскладываются
+        по лентам, но попадают в ленту при чтении."""
+
+        with mock.patch.object(feed, "FOLLOW_FEED_FANOUT_LIMIT", 0):
+            Follow.objects.create(user=self.follower, author=self.author)
+            new_post = Post.objects.create(
+                author=self.author, text="Запись популярного автора"
+            )
+
+            self.assertFalse(
+                FeedEntry.objects.filter(user=self.follower).exists()
+            )
+            self.assertEqual(
+                self.feed_pks(), [new_post.pk, self.old_post.pk]
+            )
+
+    def test_author_dropping_under_limit_keeps_posts_in_feed(self):
+        """Посты, написанные, пока автор был популярным, остаются
+        в лентах после отписки, вернувшей его под лимит."""
+
+        other = User.objects.create_user(username="TestOther")
+        with mock.patch.object(feed, "FOLLOW_FEED_FANOUT_LIMIT", 1):
+            Follow.objects.create(user=self.follower, author=self.author)
+            Follow.objects.create(user=other, author=self.author)
+            post = Post.objects.create(
+                author=self.author, text="Запись популярного автора"
+            )
+            self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+            Follow.objects.get(user=other).delete()
+            self.assertEqual(self.feed_pks(), [post.pk, self.old_post.pk])
@@ -1,11 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from posts import forms, uploads
 from posts.models import Comment, Group, Post
 
 User = get_user_model()
@@ -192,3 +196,74 @@ class PostCreateFormTests(TestCase):
         self.assertFalse(
             Comment.objects.filter(post=self.post, text=comment_text).exists()
         )
+
+
+def make_image(size, image_format="PNG"):
+    content = BytesIO()
+    Image.new("RGB", size, "red").save(content, image_format)
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="TestUploader")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def post_image(self, name, content):
+        return self.authorized_client.post(
+            reverse("posts:post_create"),
+            data={
+                "text": "Пост с картинкой",
+                "image": SimpleUploadedFile(name, content),
+            },
+        )
+
+    def test_oversized_file_rejected_while_streaming(self):
+        """Прием слишком большого файла прекращается на лимите."""
+
+        content = make_image((64, 64))
+        with mock.patch.object(
+            uploads, "POST_IMAGE_MAX_SIZE", 100
+        ), mock.patch.object(forms, "POST_IMAGE_MAX_SIZE", 100):
+            response = self.post_image("big.png", content)
+        self.assertFormError(
+            response,
+            "form",
+            "image",
+            "Размер файла не должен превышать 100\xa0байт.",
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_many_pixels_rejected(self):
+        """Размеры проверяются по заголовку картинки."""
+
+        with mock.patch.object(forms, "POST_IMAGE_MAX_PIXELS", 100):
+            response = self.post_image("wide.png", make_image((20, 20)))
+        self.assertFormError(
+            response,
+            "form",
+            "image",
+            "Слишком большая картинка: не более 100 пикселей.",
+        )
+
+    def test_large_image_shrunk_and_reencoded(self):
+        """Большая картинка уменьшается и сохраняется в JPEG."""
+
+        with mock.patch.object(forms, "POST_IMAGE_MAX_RESOLUTION", 50):
+            self.post_image("large.png", make_image((200, 100)))
+        post = Post.objects.get()
+        self.assertEqual(post.image.name, "posts/large.jpg")
+        with Image.open(post.image) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (50, 25))
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStat, Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -105,3 +108,100 @@ class GroupModelTest(TestCase):
                 self.assertEqual(
                     group._meta.get_field(value).help_text, expected
                 )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.group = Group.objects.create(
+            title="Тестовая группа", slug="first", description="Описание"
+        )
+        cls.group_second = Group.objects.create(
+            title="Вторая группа", slug="second", description="Описание"
+        )
+
+    def assertCounters(self, author_posts, group_posts, group_second_posts):
+        self.user.stat.refresh_from_db()
+        self.group.refresh_from_db()
+        self.group_second.refresh_from_db()
+        self.assertEqual(self.user.stat.posts_count, author_posts)
+        self.assertEqual(self.group.posts_count, group_posts)
+        self.assertEqual(self.group_second.posts_count, group_second_posts)
+
+    def test_post_counters_follow_create_edit_delete(self):
+        """Счетчики постов автора и групп меняются вместе с постами."""
+
+        post = Post.objects.create(
+            author=self.user, text="Тестовая запись", group=self.group
+        )
+        Post.objects.create(author=self.user, text="Без группы")
+        self.assertCounters(2, 1, 0)
+
+        post.group = self.group_second
+        post.save()
+        self.assertCounters(2, 0, 1)
+
+        post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_comment_counter(self):
+        """Счетчик комментариев поста меняется вместе с комментариями."""
+
+        post = Post.objects.create(author=self.user, text="Тестовая запись")
+        comment = Comment.objects.create(
+            post=post, author=self.user, text="Комментарий"
+        )
+        Comment.objects.create(post=post, author=self.user, text="Еще один")
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_drifted_counters_do_not_go_negative(self):
+        """Удаление поста, не учтенного в счетчиках, не уводит их
+        ниже нуля."""
+
+        post = Post.objects.create(
+            author=self.user, text="Тестовая запись", group=self.group
+        )
+        AuthorStat.objects.update(posts_count=0)
+        Group.objects.update(posts_count=0)
+
+        post.delete()
+        self.assertCounters(0, 0, 0)
+
+    def test_user_with_posts_and_follows_can_be_deleted(self):
+        """Каскадное удаление постов и подписок не создает заново
+        статистику удаляемого пользователя."""
+
+        author = User.objects.create_user(username="leaving")
+        author_id = author.pk
+        Post.objects.create(author=author, text="Тестовая запись")
+        Follow.objects.create(user=self.user, author=author)
+        Follow.objects.create(user=author, author=self.user)
+
+        author.delete()
+        self.assertFalse(AuthorStat.objects.filter(user_id=author_id).exists())
+        self.user.stat.refresh_from_db()
+        self.assertEqual(self.user.stat.followers_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters восстанавливает испорченные счетчики."""
+
+        post = Post.objects.create(
+            author=self.user, text="Тестовая запись", group=self.group
+        )
+        Comment.objects.create(post=post, author=self.user, text="Коммент")
+        AuthorStat.objects.all().delete()
+        Group.objects.update(posts_count=100)
+        Post.objects.update(comments_count=100)
+
+        call_command("rebuild_counters", stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertCounters(1, 1, 0)
+        self.assertEqual(post.comments_count, 1)
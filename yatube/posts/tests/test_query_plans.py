@@ -0,0 +1,110 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import bulk
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+# Полный просмотр таблицы без индекса и сортировка без индекса
+# в плане SQLite. До 3.36 план пишет "SCAN TABLE posts_post",
+# просмотр по индексу заканчивается "USING (COVERING) INDEX ...".
+FULL_SCAN_RE = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+TEMP_SORT_RE = re.compile(r"^USE TEMP B-TREE FOR .*ORDER BY")
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц и API posts используют индексы.
+
+    Для каждого запроса каждой страницы выполняется EXPLAIN QUERY PLAN,
+    тест падает, если какой-то запрос начал читать таблицу целиком
+    или сортировать ее без индекса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="TestAuthor")
+        cls.follower = User.objects.create_user(username="TestFollower")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="testslug",
+            description="Тестовое описание",
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text="Тестовая запись", group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.follower, text="Комментарий"
+        )
+        cls.follower.follower.create(author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_views_use_indexes(self):
+        """Ни один запрос страниц не читает таблицу целиком
+        и не сортирует выборку без индекса."""
+
+        addresses = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.user.username}),
+            reverse("posts:post_detail", kwargs={"post_id": self.post.pk}),
+            reverse("posts:post_comments", kwargs={"post_id": self.post.pk}),
+            reverse("posts:post_search") + "?q=запись",
+            reverse("posts:follow_index"),
+            reverse("posts:post_edit", kwargs={"post_id": self.post.pk}),
+        ]
+        for address in addresses:
+            self.assert_indexed(self.follower_client, address)
+
+    def test_api_and_changes_use_indexes(self):
+        """Запросы JSON API и выгрузки изменений тоже идут по индексам,
+        в том числе с водяным знаком since."""
+
+        staff = User.objects.create_user(username="TestStaff", is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        addresses = [
+            reverse("posts:api_posts"),
+            reverse("posts:api_group", kwargs={"slug": self.group.slug}),
+            reverse(
+                "posts:api_profile", kwargs={"username": self.user.username}
+            ),
+            reverse("posts:api_comments", kwargs={"post_id": self.post.pk}),
+        ]
+        for address in addresses:
+            self.assert_indexed(self.follower_client, address)
+        for model in bulk.EXPORTS:
+            address = reverse("posts:changes", kwargs={"model": model})
+            self.assert_indexed(staff_client, address)
+            self.assert_indexed(
+                staff_client, address + "?since=2020-01-01T00:00:00"
+            )
+
+    def assert_indexed(self, client, address):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(address)
+            self.assertLess(response.status_code, 400, address)
+            if response.streaming:
+                # выгрузка читает базу, пока ответ отдается
+                b"".join(response.streaming_content)
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT"):
+                continue
+            for step in self.explain(sql):
+                with self.subTest(address=address, sql=sql):
+                    self.assertIsNone(FULL_SCAN_RE.match(step), step)
+                    self.assertIsNone(TEMP_SORT_RE.match(step), step)
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from core import tasks
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="TestAuthor")
+        cls.relevant = Post.objects.create(
+            author=cls.user, text="Котики и еще раз котики <b>"
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text="Про котиков и собак"
+        )
+        cls.unrelated = Post.objects.create(
+            author=cls.user, text="Совсем о другом"
+        )
+
+    def test_search_ranks_and_highlights(self):
+        """Поиск находит посты по началу слова, сортирует по
+        релевантности и подсвечивает слова, экранируя текст."""
+
+        response = self.client.get(
+            reverse("posts:post_search"), {"q": "котик"}
+        )
+        page_obj = response.context["page_obj"]
+        self.assertEqual(page_obj.paginator.count, 2)
+        self.assertEqual(list(page_obj), [self.relevant, self.other])
+        self.assertContains(
+            response,
+            "<mark>Котики</mark> и еще раз <mark>котики</mark> &lt;b&gt;",
+        )
+        self.assertNotContains(response, self.unrelated.text)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+
+        unrelated = Post.objects.get(pk=self.unrelated.pk)
+        unrelated.text = "Теперь про котиков"
+        unrelated.save()
+        Post.objects.get(pk=self.relevant.pk).delete()
+
+        results = search.SearchResults("котиков")
+        self.assertEqual(results.count(), 2)
+        self.assertCountEqual(results[0:10], [self.other, self.unrelated])
+        self.assertEqual(search.SearchResults("раз").count(), 0)
+
+    def test_index_is_updated_by_task_queue(self):
+        """С очередью задач пост попадает в индекс, когда ее
+        выполнит воркер, а не при сохранении."""
+
+        with mock.patch.object(tasks, "TASK_QUEUE_ASYNC", True):
+            self.client.force_login(self.user)
+            self.client.post(
+                reverse("posts:post_create"), {"text": "Новые котики"}
+            )
+            self.assertEqual(search.SearchResults("новые").count(), 0)
+            tasks.run()
+        self.assertEqual(search.SearchResults("новые").count(), 1)
+
+    def test_query_syntax_is_not_passed_to_fts(self):
+        """Операторы FTS5 в запросе не вызывают ошибку."""
+
+        response = self.client.get(
+            reverse("posts:post_search"), {"q": 'котики" OR NEAR(*'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по тому же индексу."""
+
+        admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("admin:posts_post_changelist"), {"q": "собак"}
+        )
+        self.assertEqual(
+            list(response.context["cl"].result_list), [self.other]
+        )
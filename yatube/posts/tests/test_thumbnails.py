@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from core import tasks
+from core.models import Task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from posts import thumbnails
+from posts.models import Post
+from posts.tasks import THUMBNAILS
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x01\x00"
+    b"\x01\x00\x00\x00\x00\x21\xf9\x04"
+    b"\x01\x0a\x00\x01\x00\x2c\x00\x00"
+    b"\x00\x00\x01\x00\x01\x00\x00\x02"
+    b"\x02\x4c\x01\x00\x3b"
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="TestAuthor")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            author=self.user,
+            text="Тестовая запись",
+            image=SimpleUploadedFile(
+                name="thumb.gif", content=SMALL_GIF, content_type="image/gif"
+            ),
+        )
+        self.template = Template(
+            "{% load post_images %}{% post_thumbnail post.image as im %}"
+            "{{ im.url }}"
+        )
+
+    def test_template_falls_back_to_original_until_generated(self):
+        """Пока миниатюры нет, шаблон отдает оригинал, не создавая
+        ее и не заказывая."""
+
+        with mock.patch.object(thumbnails, "schedule") as schedule:
+            html = self.template.render(Context({"post": self.post}))
+        self.assertEqual(html, self.post.image.url)
+        schedule.assert_not_called()
+        self.assertIsNone(thumbnails.ready_thumbnail(self.post.image))
+
+        thumbnails.generate(self.post.image.name)
+
+        thumbnail = thumbnails.ready_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        with mock.patch.object(thumbnails, "schedule") as schedule:
+            html = self.template.render(Context({"post": self.post}))
+        self.assertEqual(html, thumbnail.url)
+        schedule.assert_not_called()
+
+    def test_missing_variants_enqueued_once(self):
+        """generate_thumbnails --enqueue ставит по одной задаче
+        на картинку без вариантов, повторный запуск новых не ставит."""
+
+        with mock.patch.object(tasks, "TASK_QUEUE_ASYNC", True):
+            for _ in range(2):
+                call_command(
+                    "generate_thumbnails", "--enqueue", stdout=StringIO()
+                )
+        self.assertEqual(
+            list(Task.objects.values_list("name", "payload")),
+            [(THUMBNAILS, f'"{self.post.image.name}"')],
+        )
+
+    def test_generate_records_variants_for_srcset(self):
+        """Варианты картинки записываются в базу и выводятся в srcset."""
+
+        thumbnails.generate(self.post.image.name)
+
+        variants = self.post.image_variants.all()
+        self.assertEqual(
+            len(variants),
+            len(thumbnails.POST_IMAGE_WIDTHS)
+            * len(thumbnails.POST_IMAGE_VARIANT_FORMATS),
+        )
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        template = Template("{% load post_images %}{% post_picture post %}")
+        with mock.patch.object(thumbnails, "schedule") as schedule:
+            html = template.render(Context({"post": post}))
+        schedule.assert_not_called()
+        self.assertIn('<source type="image/webp"', html)
+        for variant in variants:
+            self.assertIn(f"{variant.image.url} {variant.width}w", html)
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from posts.models import Post
+from posts.utils import KeysetPaginator, paginations
+
+User = get_user_model()
+
+PER_PAGE = 3
+POST_COUNT = 8
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="TestAuthor")
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f"Тестовая запись {i}")
+            for i in range(POST_COUNT)
+        )
+        cls.expected_pks = list(
+            Post.objects.order_by("-created", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+
+    def test_keyset_pages_cover_all_posts_forward_and_back(self):
+        """Курсоры next/previous обходят ленту без пропусков и повторов."""
+
+        paginator = KeysetPaginator(Post.objects.all(), PER_PAGE)
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        seen = [post.pk for page in pages for post in page]
+        self.assertEqual(seen, self.expected_pks)
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in pages[-2]]
+        )
+
+    def test_keyset_page_runs_single_query(self):
+        """Страница курсорной пагинации не выполняет COUNT(*)."""
+
+        paginator = KeysetPaginator(Post.objects.all(), PER_PAGE)
+        cursor = paginator.get_page(None).next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.get_page(cursor)
+            self.assertEqual(len(page), PER_PAGE)
+            self.assertTrue(page.has_next())
+            self.assertTrue(page.has_previous())
+
+    def test_paginations_keyset_mode_ignores_broken_cursor(self):
+        """Испорченный курсор дает первую страницу."""
+
+        request = RequestFactory().get("/", {"cursor": "broken"})
+        page = paginations(request, Post.objects.all(), mode="keyset")
+        self.assertEqual(page.number, 1)
+        self.assertEqual(page[0].pk, self.expected_pks[0])
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+import time
 
 from django import forms
 from django.conf import settings
@@ -8,7 +9,8 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Group, Post
+from django.utils.http import http_date
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -17,6 +19,7 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 POST_PER_PAGE = getattr(settings, "POST_PER_PAGE", None)
 POST_COUNT_ON_SECOND_PAGE = 2
+COMMENTS_PER_PAGE = getattr(settings, "COMMENTS_PER_PAGE", None)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -295,45 +298,69 @@ class TaskPagesTests(TestCase):
 
     def test_cache_index_page(self):
         """Тест кэширования.
-        Добавленная тестовая запись появляется после очистки кэша.
-        Удаленна тестовая запись пропадает только  после очистки кэша.
+        Повторный запрос главной берет ленту из кэша.
+        Добавленная и удаленная записи видны сразу, без очистки кэша.
         """
 
-        response = self.client.get(reverse("posts:index"))
-        context_first_object_before_add = response.context["page_obj"][0]
+        self.client.get(reverse("posts:index"))
+        # из базы читается только COUNT(*) пагинатора
+        with self.assertNumQueries(1):
+            self.client.get(reverse("posts:index"))
 
-        post_text = "Тестовая запись появиться после очистки кэша."
+        post_text = "Тестовая запись появится сразу после добавления."
         post = Post.objects.create(
             author=self.user, text=post_text, group=self.group
         )
         response = self.client.get(reverse("posts:index"))
-        context_right_after_add = response.context
-        self.assertIsNone(context_right_after_add)
-
-        cache.clear()
-        response = self.client.get(reverse("posts:index"))
-        context_first_object_add_after_clear_cache = response.context[
-            "page_obj"
-        ][0]
+        self.assertContains(response, post_text)
         self.db_vs_context_comparison(
-            post, context_first_object_add_after_clear_cache, no_iamge=True
+            post, response.context["page_obj"][0], no_iamge=True
         )
 
         post.delete()
         response = self.client.get(reverse("posts:index"))
-        context_right_after_delete_post = response.context
-        self.assertIsNone(context_right_after_delete_post)
+        self.assertNotContains(response, post_text)
 
-        cache.clear()
-        response = self.client.get(reverse("posts:index"))
-        context_first_object_delete_after_clear_cache = response.context[
-            "page_obj"
-        ][0]
-        self.db_vs_context_comparison(
-            context_first_object_before_add,
-            context_first_object_delete_after_clear_cache,
-            no_iamge=True,
+    def test_cache_post_detail_comments(self):
+        """Новый комментарий сразу виден на закэшированной странице поста."""
+
+        address = reverse(
+            "posts:post_detail", kwargs={"post_id": self.post_second.pk}
+        )
+        self.client.get(address)
+        comment_text = "Комментарий после кэширования страницы"
+        self.authorized_client.post(
+            reverse(
+                "posts:add_comment",
+                kwargs={"post_id": self.post_second.pk},
+            ),
+            data={"text": comment_text},
         )
+        response = self.client.get(address)
+        self.assertContains(response, comment_text)
+
+    def test_cache_follows_author_rename(self):
+        """Новое имя автора сразу видно на закэшированных лентах,
+        а сохранение без смены имени кэш не сбрасывает."""
+
+        addresses = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=[self.group_slug_value]),
+        )
+        for address in addresses:
+            self.client.get(address)
+        author = User.objects.get(pk=self.user.pk)
+        author.save(update_fields=["last_login"])
+        with self.assertNumQueries(1):
+            self.client.get(addresses[0])
+
+        author.first_name = "Переименованный"
+        author.save()
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertContains(
+                    self.client.get(address), "Переименованный"
+                )
 
     def test_autorized_can_follow_unfollow(self):
         """Авторизованный пользователь может подписываться на других пользователей
@@ -391,3 +418,240 @@ class TaskPagesTests(TestCase):
         )
         context_len_not_follower = len(response.context["page_obj"])
         self.assertEqual(context_len_not_follower, 0)
+
+
+class FeedQueryBudgetTests(TestCase):
+    """Число запросов страницы ленты не зависит от числа постов на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username="TestAuthor", first_name="Имя", last_name="Фамилия"
+        )
+        cls.follower = User.objects.create_user(username="TestFollower")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="testslug",
+            description="Тестовое описание",
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f"Тестовая запись {i}", group=cls.group)
+            for i in range(POST_PER_PAGE)
+        )
+        cls.follower.follower.create(author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def test_feed_pages_query_budget(self):
+        """Ленты укладываются в бюджет запросов без N+1."""
+
+        # запросы: сессия и пользователь для авторизованного клиента,
+        # объект страницы (группа/автор), COUNT(*), сами посты
+        # и варианты их картинок
+        pages_budget = {
+            reverse("posts:index"): (self.client, 3),
+            reverse(
+                "posts:group_list", kwargs={"slug": self.group.slug}
+            ): (self.client, 4),
+            reverse(
+                "posts:profile", kwargs={"username": self.user.username}
+            ): (self.client, 4),
+            reverse("posts:follow_index"): (self.follower_client, 6),
+        }
+        for address, (client, budget) in pages_budget.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(budget):
+                    response = client.get(address)
+                self.assertEqual(
+                    len(response.context["page_obj"]), POST_PER_PAGE
+                )
+
+
+class PostCommentsPaginationTests(TestCase):
+    """Комментарии поста выводятся страницами с подгрузкой."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="TestAuthor")
+        cls.post = Post.objects.create(author=cls.user, text="Тестовая запись")
+        cls.commentators = [
+            User.objects.create_user(username=f"TestCommentator{i}")
+            for i in range(3)
+        ]
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=cls.commentators[i % 3],
+                text=f"Комментарий {i}",
+            )
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_shows_first_comments_page(self):
+        """Страница поста выводит одну страницу комментариев
+        с авторами, загруженными тем же запросом."""
+
+        address = reverse(
+            "posts:post_detail", kwargs={"post_id": self.post.pk}
+        )
+        # пост с автором и страница комментариев с авторами
+        with self.assertNumQueries(2):
+            response = self.client.get(address)
+        comments = response.context["comments"]
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertTrue(comments.has_next())
+        self.assertContains(
+            response,
+            reverse("posts:post_comments", kwargs={"post_id": self.post.pk}),
+        )
+
+    def test_load_more_returns_next_comments(self):
+        """JSON-подгрузка отдает оставшиеся комментарии без повторов."""
+
+        response = self.client.get(
+            reverse("posts:post_detail", kwargs={"post_id": self.post.pk})
+        )
+        shown = {comment.pk for comment in response.context["comments"]}
+        data = self.client.get(
+            reverse("posts:post_comments", kwargs={"post_id": self.post.pk}),
+            {"comments": response.context["comments"].next_cursor},
+        ).json()
+        loaded = {comment["id"] for comment in data["comments"]}
+        self.assertEqual(len(loaded), 5)
+        self.assertFalse(shown & loaded)
+        self.assertIsNone(data["next"])
+        self.assertIn(data["comments"][0]["text"], data["html"])
+
+
+class FollowWritesTests(TestCase):
+    """Подписка и отписка идемпотентны и доступны через AJAX."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="TestAuthor")
+        cls.follower = User.objects.create_user(username="TestFollower")
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+        self.follow_address = reverse(
+            "posts:profile_follow", kwargs={"username": self.author.username}
+        )
+        self.unfollow_address = reverse(
+            "posts:profile_unfollow",
+            kwargs={"username": self.author.username},
+        )
+
+    def test_repeated_follow_is_ignored(self):
+        """Повторная подписка не создает дубль и не меняет счетчик."""
+
+        self.follower_client.get(self.follow_address)
+        self.follower_client.get(self.follow_address)
+        self.assertEqual(
+            Follow.objects.filter(
+                user=self.follower, author=self.author
+            ).count(),
+            1,
+        )
+        self.author.stat.refresh_from_db()
+        self.assertEqual(self.author.stat.followers_count, 1)
+
+    def test_ajax_follow_returns_state(self):
+        """AJAX-запрос получает JSON вместо редиректа."""
+
+        response = self.follower_client.get(
+            self.follow_address, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+        self.assertEqual(
+            response.json(), {"following": True, "followers_count": 1}
+        )
+        response = self.follower_client.get(
+            self.unfollow_address, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+        self.assertEqual(
+            response.json(), {"following": False, "followers_count": 0}
+        )
+
+    def test_profile_reads_follow_state_with_author(self):
+        """Состояние подписки приходит тем же запросом, что и автор."""
+
+        Follow.objects.follow(self.follower, self.author)
+        response = self.follower_client.get(
+            reverse("posts:profile", kwargs={"username": self.author.username})
+        )
+        self.assertEqual(response.context["following"], "can_unfollow")
+        self.assertTrue(response.context["author"].is_followed)
+
+
+class ConditionalGetTests(TestCase):
+    """Страницы отвечают 304, пока их содержимое не изменилось."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="TestAuthor")
+        cls.group = Group.objects.create(title="Группа", slug="test-slug")
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text="Текст"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_request_not_modified(self):
+        addresses = (
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": "TestAuthor"}),
+            reverse("posts:post_detail", kwargs={"post_id": self.post.pk}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                etag = response["ETag"]
+                response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_changes_and_login_refresh_page(self):
+        """Новый комментарий или вход пользователя меняют ETag."""
+
+        address = reverse(
+            "posts:post_detail", kwargs={"post_id": self.post.pk}
+        )
+        etag = self.client.get(address)["ETag"]
+        Comment.objects.create(
+            post=self.post, author=self.author, text="Новый"
+        )
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Новый")
+
+        etag = response["ETag"]
+        self.client.force_login(self.author)
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_modified_since_does_not_survive_login(self):
+        """Запрос только с If-Modified-Since после входа получает
+        страницу вошедшего пользователя, а не 304."""
+
+        address = reverse("posts:index")
+        since = http_date(time.time() + 60)
+        response = self.client.get(address, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertContains(response, "Войти")
+
+        self.client.force_login(self.author)
+        response = self.client.get(address, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "TestAuthor")
@@ -0,0 +1,155 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching
+from .models import Post, PostImageVariant
+
+logger = logging.getLogger(__name__)
+
+POST_THUMBNAIL_GEOMETRY = "960x339"
+POST_THUMBNAIL_OPTIONS = {"crop": "center", "upscale": True}
+POST_IMAGE_WIDTHS = getattr(settings, "POST_IMAGE_WIDTHS", (320, 640, 960))
+POST_IMAGE_VARIANT_FORMATS = getattr(
+    settings, "POST_IMAGE_VARIANT_FORMATS", ("WEBP", "JPEG")
+)
+
+THUMBNAIL_ASYNC = getattr(settings, "THUMBNAIL_ASYNC", True)
+THUMBNAIL_WORKERS = getattr(settings, "THUMBNAIL_WORKERS", 2)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _thumbnail_options(source, options):
+    # Те же умолчания, что добавляет ThumbnailBackend.get_thumbnail:
+    # от них зависит имя файла миниатюры.
+    options = dict(options)
+    backend = default.backend
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def ready_thumbnail(image, geometry=POST_THUMBNAIL_GEOMETRY, **options):
+    """Возвращает миниатюру, если она уже создана, иначе None.
+    В отличие от тега {% thumbnail %} никогда не создает ее сам."""
+
+    if not image:
+        return None
+    source = ImageFile(image)
+    options = _thumbnail_options(source, options or POST_THUMBNAIL_OPTIONS)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def _variant_geometries():
+    # у вариантов те же пропорции, что у основной миниатюры
+    width, height = map(int, POST_THUMBNAIL_GEOMETRY.split("x"))
+    for variant_width in POST_IMAGE_WIDTHS:
+        yield variant_width, round(variant_width * height / width)
+
+
+def make_variants(name):
+    """Создает уменьшенные копии картинки name всех ширин и форматов.
+    Возвращает список (миниатюра, ширина, высота, формат)."""
+
+    variants = []
+    for image_format in POST_IMAGE_VARIANT_FORMATS:
+        for width, height in _variant_geometries():
+            thumbnail = get_thumbnail(
+                name,
+                f"{width}x{height}",
+                format=image_format,
+                **POST_THUMBNAIL_OPTIONS,
+            )
+            variants.append((thumbnail, width, height, image_format))
+    return variants
+
+
+def generate(name):
+    """Создает миниатюру и варианты для srcset картинки name, записывает
+    варианты в базу и сбрасывает кэш страниц с постами, где до того
+    была показана заглушка."""
+
+    get_thumbnail(name, POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS)
+    variants = make_variants(name)
+    for post in Post.objects.filter(image=name).only(
+        "pk", "author_id", "group_id"
+    ):
+        with transaction.atomic():
+            post.image_variants.all().delete()
+            PostImageVariant.objects.bulk_create(
+                PostImageVariant(
+                    post=post,
+                    source=name,
+                    image=thumbnail.name,
+                    width=width,
+                    height=height,
+                    format=image_format,
+                )
+                for thumbnail, width, height, image_format in variants
+            )
+        caching.bump(*caching.post_scopes(post, post.group_id))
+
+
+def generate_safely(name):
+    """То же, что generate, но ошибка пишется в лог.
+    Возвращает True, если миниатюра создана."""
+
+    try:
+        generate(name)
+    except Exception:
+        logger.exception("Не удалось создать миниатюру %s", name)
+        return False
+    return True
+
+
+def _generate_in_background(name):
+    try:
+        generate_safely(name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        # у фонового потока свое соединение с базой
+        connection.close()
+
+
+def _submit(name):
+    global _executor
+    if not THUMBNAIL_ASYNC:
+        generate(name)
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails",
+            )
+    _executor.submit(_generate_in_background, name)
+
+
+def schedule(name):
+    """Ставит создание миниатюры в фоновый пул после коммита
+    транзакции, в которой сохранен пост."""
+
+    if name:
+        transaction.on_commit(partial(_submit, name))
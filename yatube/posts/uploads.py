@@ -0,0 +1,45 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+POST_IMAGE_MAX_SIZE = getattr(settings, "POST_IMAGE_MAX_SIZE", None)
+
+
+class OversizedUploadedFile(UploadedFile):
+    """Загруженный файл, превысивший лимит: содержимое отброшено,
+    size хранит число полученных байт, чтобы форма отклонила файл."""
+
+    def __init__(self, name, content_type, size, charset=None):
+        super().__init__(BytesIO(), name, content_type, size, charset)
+
+
+class SizeLimitedUploadHandler(FileUploadHandler):
+    """Первый обработчик загрузки: считает байты файла и, как только их
+    больше POST_IMAGE_MAX_SIZE, перестает передавать данные дальше.
+
+    Память и место во временном файле на одну загрузку ограничены
+    лимитом, а вместо обрезанного файла форма получает пустой
+    OversizedUploadedFile и возвращает ошибку размера.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if POST_IMAGE_MAX_SIZE and self.received > POST_IMAGE_MAX_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if POST_IMAGE_MAX_SIZE and self.received > POST_IMAGE_MAX_SIZE:
+            return OversizedUploadedFile(
+                self.file_name,
+                self.content_type,
+                self.received,
+                self.charset,
+            )
+        return None
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = "posts"
 
@@ -14,7 +14,26 @@ urlpatterns = [
     path(
         "posts/<int:post_id>/comment/", views.add_comment, name="add_comment"
     ),
+    path("search/", views.post_search, name="post_search"),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments",
+    ),
+    path("changes/<str:model>/", views.changes, name="changes"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("api/posts/", api.posts, name="api_posts"),
+    path("api/group/<slug:slug>/", api.group_posts, name="api_group"),
+    path(
+        "api/profile/<str:username>/",
+        api.profile_posts,
+        name="api_profile",
+    ),
+    path(
+        "api/posts/<int:post_id>/comments/",
+        api.post_comments,
+        name="api_comments",
+    ),
     path(
         "profile/<str:username>/follow/",
         views.profile_follow,
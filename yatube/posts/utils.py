@@ -1,13 +1,176 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
 POST_PER_PAGE = getattr(settings, "POST_PER_PAGE", None)
+POST_PAGINATION_MODE = getattr(settings, "POST_PAGINATION_MODE", "offset")
+
+CURSOR_NEXT = "n"
+CURSOR_PREVIOUS = "p"
+
+
+def encode_cursor(direction, created, pk):
+    """Упаковывает направление и ключ записи (created, pk) в строку,
+    безопасную для использования в URL."""
+
+    raw = f"{direction}|{created.isoformat()}|{pk}".encode()
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Распаковывает курсор. Для испорченного курсора возвращает None."""
+
+    try:
+        raw = urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        direction, created, pk = raw.split("|")
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or created is None:
+        return None
+    return direction, created, pk
+
+
+class KeysetPage:
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс django.core.paginator.Page, который нужен
+    шаблону posts/includes/paginator.html, но не знает общего числа
+    записей и номера страницы. Выборка выполняется лениво одним
+    запросом при первом обращении к объектам страницы.
+    """
+
+    is_keyset = True
+
+    def __init__(self, paginator, token=None):
+        self.paginator = paginator
+        self.token = token
+        self.cursor = decode_cursor(token) if token else None
+
+    @cached_property
+    def _rows(self):
+        """Возвращает (объекты, есть ли записи новее, есть ли старее)."""
+
+        if self.cursor is None:
+            return self._first_rows()
+
+        per_page = self.paginator.per_page
+        queryset = self.paginator.object_list
+
+        direction, created, pk = self.cursor
+        if direction == CURSOR_NEXT:
+            rows = list(
+                queryset.filter(
+                    Q(created__lt=created) | Q(created=created, pk__lt=pk)
+                ).order_by("-created", "-pk")[: per_page + 1]
+            )
+            return rows[:per_page], True, len(rows) > per_page
+
+        rows = list(
+            queryset.filter(
+                Q(created__gt=created) | Q(created=created, pk__gt=pk)
+            ).order_by("created", "pk")[: per_page + 1]
+        )
+        if len(rows) <= per_page:
+            # Дошли до начала ленты: показываем первую страницу целиком.
+            return self._first_rows()
+        rows = rows[:per_page]
+        rows.reverse()
+        return rows, True, True
+
+    def _first_rows(self):
+        per_page = self.paginator.per_page
+        rows = list(
+            self.paginator.object_list.order_by("-created", "-pk")[
+                : per_page + 1
+            ]
+        )
+        return rows[:per_page], False, len(rows) > per_page
+
+    @property
+    def object_list(self):
+        return self._rows[0]
 
+    @property
+    def number(self):
+        """Ключ страницы для кэша и шаблонов: курсор или 1 для первой."""
 
-def paginations(request, data_list):
+        return self.token if self.cursor else 1
+
+    def __repr__(self):
+        return f"<KeysetPage {self.number}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._rows[2]
+
+    def has_previous(self):
+        return self._rows[1]
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(CURSOR_NEXT, last.created, last.pk)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        first = self.object_list[0]
+        return encode_cursor(CURSOR_PREVIOUS, first.created, first.pk)
+
+
+class KeysetPaginator:
+    """Курсорная пагинация по индексированному полю created и pk.
+
+    В отличие от Paginator не выполняет COUNT(*) и OFFSET: каждая
+    страница выбирается условием по ключу последней показанной записи,
+    поэтому стоимость далекой страницы равна стоимости первой.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, cursor_param="cursor"):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.cursor_param = cursor_param
+
+    def get_page(self, token):
+        """Возвращает страницу по курсору.
+        Пустой или испорченный курсор дает первую страницу."""
+
+        return KeysetPage(self, token)
+
+
+def paginations(request, data_list, mode=POST_PAGINATION_MODE):
     """Пагинация данных по страницам.
     Принимает на вход request и list с элементами данных.
-    Возвращает объект страницы."""
+    Возвращает объект страницы.
+
+    В режиме mode="keyset" используется курсорная пагинация
+    по полям created и pk, курсор передается в GET-параметре cursor."""
+
+    if mode == "keyset":
+        paginator = KeysetPaginator(data_list, POST_PER_PAGE)
+        return paginator.get_page(request.GET.get(paginator.cursor_param))
 
     paginator = Paginator(data_list, POST_PER_PAGE)
     page_number = request.GET.get("page")
@@ -1,56 +1,109 @@
+import json
 from urllib import request
 
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
 
+from . import bulk, caching, feed, search
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginations
+from .models import AuthorStat, Comment, Follow, Group, Post, User
+from .utils import KeysetPaginator, paginations
 
+COMMENTS_PER_PAGE = getattr(settings, "COMMENTS_PER_PAGE", 20)
 
-@cache_page(60 * 20)
+
+def _load_index(request):
+    return None, [caching.INDEX, caching.GROUPS]
+
+
+def _load_group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return group, [caching.group_scope(group.pk), caching.GROUPS]
+
+
+def _load_profile(request, username):
+    authors = User.objects.select_related("stat")
+    scopes = [caching.GROUPS]
+    if request.user.is_authenticated:
+        authors = authors.annotate(
+            is_followed=Exists(
+                Follow.objects.filter(
+                    user=request.user, author=OuterRef("pk")
+                )
+            )
+        )
+        # от подписок пользователя зависит кнопка «Подписаться»
+        scopes.append(caching.follow_scope(request.user.pk))
+    author = get_object_or_404(authors, username=username)
+    return author, [caching.author_scope(author.pk), *scopes]
+
+
+def _load_post(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related("author__stat", "group"), pk=post_id
+    )
+    return post, [
+        caching.post_scope(post.pk),
+        caching.author_scope(post.author_id),
+        caching.GROUPS,
+    ]
+
+
+@caching.conditional(_load_index)
 def index(request):
     """Вывод POST_PER_PAGE объектов модели Post,
     отсортированных по полю created по убыванию,
     с учетом номера страницы переданного в GET.
     """
 
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     page_obj = paginations(request, post_list)
 
     context = {
         "page_obj": page_obj,
+        **caching.fragment_context(caching.INDEX, caching.GROUPS),
     }
     return render(request, "posts/index.html", context)
 
 
+@caching.conditional(_load_group)
 def group_posts(request, slug):
     """Страница список постов."""
-    group = get_object_or_404(Group, slug=slug)
+    group = request.page_object
 
-    post_list = group.posts.all()
+    post_list = group.posts.for_feed()
     page_obj = paginations(request, post_list)
 
     template = "posts/group_list.html"
     context = {
         "group": group,
         "page_obj": page_obj,
+        **caching.fragment_context(
+            caching.group_scope(group.pk), caching.GROUPS
+        ),
     }
     return render(request, template, context)
 
 
+@caching.conditional(_load_profile)
 def profile(request, username):
     """Список постов пользователя, общее количество постов,
     инофрмация о пользователе."""
 
-    author = get_object_or_404(User, username=username)
+    author = request.page_object
 
-    post_list = author.posts.all()
+    post_list = author.posts.for_feed()
     page_obj = paginations(request, post_list)
     following = False
     if request.user.is_authenticated:
-        if Follow.objects.filter(user=request.user, author=author).count():
+        if author.is_followed:
             following = "can_unfollow"
         else:
             following = "can_follow"
@@ -60,28 +113,120 @@ def profile(request, username):
         "page_obj": page_obj,
         "author": author,
         "following": following,
+        **caching.fragment_context(
+            caching.author_scope(author.pk), caching.GROUPS
+        ),
     }
 
     return render(request, template, context)
 
 
+@caching.conditional(_load_post)
 def post_detail(request, post_id):
     """Страница поста и количество постов пользователя."""
 
     template = "posts/post_detail.html"
-    post = get_object_or_404(Post, pk=post_id)
+    post = request.page_object
 
     form = CommentForm()
-    comments = post.comments.all()
+    # Выборки страницы не распараллеливаются: пост с автором и его
+    # счетчиками - один запрос, он нужен раньше, для условного GET,
+    # а комментарии выбираются лениво и только при промахе кэша
+    # фрагмента.
+    comments = comments_page(request, post.pk)
     context = {
         "post": post,
         "form": form,
         "comments": comments,
+        **caching.fragment_context(
+            caching.post_scope(post.pk),
+            caching.author_scope(post.author_id),
+            caching.GROUPS,
+        ),
     }
 
     return render(request, template, context)
 
 
+def comments_page(request, post_id):
+    """Страница комментариев поста с авторами, выбранная по курсору
+    из GET-параметра comments: стоимость не зависит от их числа."""
+
+    comments = (
+        Comment.objects.filter(post_id=post_id)
+        .select_related("author")
+        .only("text", "created", "post_id", "author__username")
+    )
+    paginator = KeysetPaginator(
+        comments, COMMENTS_PER_PAGE, cursor_param="comments"
+    )
+    return paginator.get_page(request.GET.get(paginator.cursor_param))
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать еще»."""
+
+    comments = comments_page(request, post_id)
+    next_url = None
+    if comments.has_next():
+        next_url = (
+            reverse("posts:post_comments", kwargs={"post_id": post_id})
+            + "?"
+            + urlencode({"comments": comments.next_cursor})
+        )
+    return JsonResponse(
+        {
+            "comments": [
+                {
+                    "id": comment.pk,
+                    "author": comment.author.username,
+                    "text": comment.text,
+                    "created": comment.created,
+                }
+                for comment in comments
+            ],
+            "html": render_to_string(
+                "posts/includes/comments.html", {"comments": comments}
+            ),
+            "next": next_url,
+        }
+    )
+
+
+def changes(request, model):
+    """Изменения и удаления модели после ?since= в JSONL, только для
+    персонала. Следующий водяной знак - в заголовке X-Watermark."""
+
+    if not request.user.is_staff or model not in bulk.EXPORTS:
+        raise Http404
+    try:
+        since = bulk.parse_watermark(request.GET.get("since"))
+    except ValueError:
+        return JsonResponse({"error": "Неверное время в since."}, status=400)
+    until = bulk.changes_until()
+    records = bulk.export_changes(model, since, until, 2000)
+    response = StreamingHttpResponse(
+        (json.dumps(record, ensure_ascii=False) + "\n" for record in records),
+        content_type="application/x-ndjson; charset=utf-8",
+    )
+    response["X-Watermark"] = until.isoformat()
+    return response
+
+
+def post_search(request):
+    """Поиск постов по тексту с сортировкой по релевантности."""
+
+    query = request.GET.get("q", "").strip()
+    page_obj = paginations(request, search.search(query), mode="offset")
+
+    context = {
+        "query": query,
+        "page_obj": page_obj,
+        "query_prefix": urlencode({"q": query}) + "&",
+    }
+    return render(request, "posts/search.html", context)
+
+
 @login_required(login_url="users:login")
 def post_create(request):
     """Добавления поста."""
@@ -92,7 +237,8 @@ def post_create(request):
     if form.is_valid():
         instance = form.save(commit=False)
         instance.author_id = request.user.id
-        instance.save()
+        with transaction.atomic():
+            instance.save()
         return redirect("posts:profile", request.user)
 
     return render(request, template, {"form": form})
@@ -113,7 +259,8 @@ def post_edit(request, post_id):
         request.POST or None, files=request.FILES or None, instance=post
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect("posts:post_detail", post.id)
 
     context = {
@@ -131,7 +278,8 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect("posts:post_detail", post_id=post_id)
 
 
@@ -139,31 +287,45 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Посты авторов, на которых подписан текущий пользователь."""
 
-    user = get_object_or_404(User, username=request.user)
-
-    followed_people = Follow.objects.filter(user=user).values("author")
-    post_list = Post.objects.filter(author__in=followed_people)
+    post_list = feed.follow_feed(request.user).for_feed()
     page_obj = paginations(request, post_list)
 
     context = {
         "page_obj": page_obj,
+        **caching.fragment_context(
+            caching.INDEX,
+            caching.GROUPS,
+            caching.follow_scope(request.user.pk),
+        ),
     }
 
     return render(request, "posts/follow.html", context)
 
 
+def follow_response(request, author, following):
+    """Ответ на подписку и отписку: для AJAX-запроса JSON с новым
+    состоянием кнопки, иначе редирект на профиль автора."""
+
+    if not request.is_ajax():
+        return redirect("posts:profile", author.username)
+    stat = AuthorStat.objects.filter(user=author).first()
+    return JsonResponse(
+        {
+            "following": following,
+            "followers_count": stat.followers_count if stat else 0,
+        }
+    )
+
+
 @login_required
 def profile_follow(request, username):
     """Подписаться на автора."""
 
     author = get_object_or_404(User, username=username)
-    allready_follow = Follow.objects.filter(
-        user=request.user, author=author
-    ).count()
-    if not allready_follow and request.user != author:
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author:
+        Follow.objects.follow(request.user, author)
 
-    return redirect("posts:profile", username)
+    return follow_response(request, author, request.user != author)
 
 
 @login_required
@@ -171,5 +333,6 @@ def profile_unfollow(request, username):
     """Отписка от автора."""
 
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
-    return redirect("posts:profile", username)
+    Follow.objects.unfollow(request.user, author)
+
+    return follow_response(request, author, False)
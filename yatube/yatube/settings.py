@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,7 +66,7 @@ ROOT_URLCONF = "yatube.urls"
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.template_backends.TimedDjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -91,6 +93,35 @@ DATABASES = {
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
     }
 }
+# Реплики только для чтения, например ["replica1", "replica2"].
+# Локально это копии db.sqlite3 в отдельных файлах, их обновляет
+# команда sync_replicas. В тестах реплики зеркалят основную базу.
+DATABASE_REPLICAS = []
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, f"db.{alias}.sqlite3"),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["core.db_router.PrimaryReplicaRouter"]
+# Профиль SQLite для продакшена (core/sqlite.py): прагмы каждому
+# подключению и постоянные подключения вместо нового на каждый запрос.
+SQLITE_PRODUCTION = not DEBUG
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    # отрицательное значение - размер в КиБ, а не в страницах
+    "cache_size": -64 * 1024,
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+SQLITE_CONN_MAX_AGE = 600
+if SQLITE_PRODUCTION:
+    for database in DATABASES.values():
+        database["CONN_MAX_AGE"] = SQLITE_CONN_MAX_AGE
+# сколько секунд после записи пользователь читает из основной базы
+REPLICA_STICKY_SECONDS = 15
 
 
 # Password validation
@@ -111,11 +142,20 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# общий для всех процессов кэш в файле SQLite
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": "core.sqlite_cache.SQLiteCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache.sqlite3"),
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+            "MAX_SIZE": 256 * 1024 * 1024,
+            "EARLY_REFRESH": 0.1,
+        },
     }
 }
+# время жизни фрагментов лент, актуальность обеспечивают версии ключей
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -153,8 +193,55 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 POST_MIN_LEN = 1
 # постов на странице
 POST_PER_PAGE = 10
+# режим пагинации лент: "offset" (номера страниц) или "keyset" (курсор)
+POST_PAGINATION_MODE = "offset"
+
+# лента подписок раскладывается по подписчикам при публикации
+FOLLOW_FEED_MATERIALIZED = True
+# авторы с большим числом подписчиков читаются в ленту на лету
+FOLLOW_FEED_FANOUT_LIMIT = 1000
+# сколько последних постов автора добавить в ленту при подписке
+FOLLOW_FEED_BACKFILL = 200
+
+# миниатюры картинок постов создаются в фоновом пуле потоков
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# ширины и форматы вариантов картинки поста для srcset
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_VARIANT_FORMATS = ("WEBP", "JPEG")
+
+# Фоновые задачи после записи постов (core/tasks.py): поисковый индекс,
+# ленты подписчиков и миниатюры выполняет команда run_tasks. Без очереди
+# индекс и ленты обновляются в запросе, а миниатюры - в пуле потоков.
+TASK_QUEUE_ASYNC = not DEBUG
+TASK_BATCH_SIZE = 100
+TASK_MAX_ATTEMPTS = 5
+# пауза перед повтором в секундах, удваивается с каждой попыткой
+TASK_RETRY_DELAY = 10
+TASK_LEASE = 300
+
+# ограничения загружаемых картинок постов
+POST_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+# большая сторона, до которой уменьшается картинка при загрузке
+POST_IMAGE_MAX_RESOLUTION = 1920
+POST_IMAGE_FORMAT = "JPEG"
+# первым стоит счетчик, который прекращает прием слишком большого файла
+FILE_UPLOAD_HANDLERS = [
+    "posts.uploads.SizeLimitedUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
 
 # настройки для Comments
 COMMENT_MIN_LEN = 1
+# комментариев на странице поста и в одной подгрузке
+COMMENTS_PER_PAGE = 20
+# записей на странице JSON API по умолчанию и наибольший limit
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 1000
 
 CSRF_FAILURE_VIEW = "core.views.csrf_failure"
+
+# метрики запросов: заголовок Server-Timing и страница /metrics/
+METRICS_ENABLED = True
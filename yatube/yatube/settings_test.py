@@ -0,0 +1,18 @@
+"""Настройки для тестов: manage.py test выбирает их сам, pytest -
+через pytest.ini.
+
+Тесты не пишут в файл кэша разработчика и не очищают его: у них свой
+кэш в памяти процесса. SQLiteCache как кэш по умолчанию проверяет
+отдельный интеграционный тест core.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES
+
+CACHES = {
+    **CACHES,
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
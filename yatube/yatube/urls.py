@@ -18,12 +18,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 urlpatterns = [
     path("", include("posts.urls", namespace="posts")),
     path("auth/", include("users.urls", namespace="users")),
     path("auth/", include("django.contrib.auth.urls")),
     path("about/", include("about.urls", namespace="about")),
     path("admin/", admin.site.urls),
+    path("metrics/", metrics, name="metrics"),
 ]
 
 handler404 = "core.views.page_not_found"